@@ -0,0 +1,107 @@
+import numpy as np
+
+# Ordernummer lagras som heltal och skrivs tillbaka med inledande nollor.
+ORDER_DIGITS = 7
+
+
+def encode_orders(orders):
+    orders = list(orders)
+    codes = np.fromiter(map(int, orders), dtype=np.int64, count=len(orders))
+    if len(codes) and (codes.min() < 0 or codes.max() >= 10 ** ORDER_DIGITS):
+        raise ValueError(f"Ordernummer måste ha högst {ORDER_DIGITS} siffror")
+    return codes
+
+
+def decode_orders(codes):
+    codes = np.asarray(codes, dtype=np.int64)
+    if not len(codes):
+        return np.zeros(0, dtype=f"U{ORDER_DIGITS}")
+    return np.char.zfill(codes.astype(str), ORDER_DIGITS)
+
+
+def _aggregate(codes, quantities):
+    # Summerar dubbletter och sorterar efter ordernummer.
+    orders, inverse = np.unique(codes, return_inverse=True)
+    totals = np.zeros(len(orders), dtype=np.int64)
+    np.add.at(totals, inverse, quantities)
+    return orders, totals
+
+
+class QuantityStore:
+    # Tre parallella kolumner sorterade på ordernummer: heltalskod, bekräftat
+    # och fakturerat antal. Inga Python-objekt per order.
+    __slots__ = ("orders", "confirmed", "invoiced")
+
+    def __init__(self, orders=None, confirmed=None, invoiced=None):
+        self.orders = np.zeros(0, dtype=np.int64) if orders is None else orders
+        self.confirmed = np.zeros(len(self.orders), dtype=np.int64) if confirmed is None else confirmed
+        self.invoiced = np.zeros(len(self.orders), dtype=np.int64) if invoiced is None else invoiced
+
+    @classmethod
+    def from_arrays(cls, codes, confirmed=None, invoiced=None):
+        codes = np.asarray(codes, dtype=np.int64)
+        store = cls()
+        if confirmed is not None:
+            store = store.merge(cls(*_aggregate(codes, np.asarray(confirmed, dtype=np.int64))))
+        if invoiced is not None:
+            orders, totals = _aggregate(codes, np.asarray(invoiced, dtype=np.int64))
+            store = store.merge(cls(orders, np.zeros(len(orders), dtype=np.int64), totals))
+        return store
+
+    @classmethod
+    def from_counts(cls, confirmation=None, invoice=None):
+        # Tar emot parsrarnas {ordernummer: antal}.
+        store = cls()
+        for counts, column in ((confirmation, "confirmed"), (invoice, "invoiced")):
+            if not counts:
+                continue
+            quantities = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+            store = store.merge(cls.from_arrays(encode_orders(counts.keys()), **{column: quantities}))
+        return store
+
+    def __len__(self):
+        return len(self.orders)
+
+    @property
+    def nbytes(self):
+        return self.orders.nbytes + self.confirmed.nbytes + self.invoiced.nbytes
+
+    def merge(self, other):
+        if not len(other):
+            return self
+        if not len(self):
+            return other
+        orders = np.union1d(self.orders, other.orders)
+        confirmed = np.zeros(len(orders), dtype=np.int64)
+        invoiced = np.zeros(len(orders), dtype=np.int64)
+        for store in (self, other):
+            positions = np.searchsorted(orders, store.orders)
+            confirmed[positions] += store.confirmed
+            invoiced[positions] += store.invoiced
+        return QuantityStore(orders, confirmed, invoiced)
+
+    def difference(self):
+        return self.invoiced - self.confirmed
+
+    def mismatched(self):
+        return self.subset(self.confirmed != self.invoiced)
+
+    def subset(self, mask):
+        return QuantityStore(self.orders[mask], self.confirmed[mask], self.invoiced[mask])
+
+    def lookup(self, order):
+        code = int(order)
+        position = np.searchsorted(self.orders, code)
+        if position < len(self.orders) and self.orders[position] == code:
+            return int(self.confirmed[position]), int(self.invoiced[position])
+        return 0, 0
+
+    def order_numbers(self):
+        return decode_orders(self.orders)
+
+    def iter_sorted(self, chunk_size=10000):
+        # Bitvis iteration så att hela liggaren aldrig blir Python-objekt samtidigt.
+        for start in range(0, len(self.orders), chunk_size):
+            stop = start + chunk_size
+            yield from zip(decode_orders(self.orders[start:stop]).tolist(),
+                           self.confirmed[start:stop].tolist(), self.invoiced[start:stop].tolist())
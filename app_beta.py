@@ -1,17 +1,27 @@
 import streamlit as st
-import pandas as pd
-import pdfplumber
-from collections import defaultdict
-from fpdf import FPDF
-import io
-import re
+from functools import partial
 import os
-from datetime import datetime
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from parse_cache import ParseCache, combined_hash, content_hash
+from jobb import FAILED, JobQueue
+from pressglass import extract_confirmation_postings, extract_invoice_postings, sum_postings, compare_orders
+from suppliers import DEFAULT_SUPPLIER, SUPPLIERS, layout
+from orderanalys import ATTRIBUTES, ORDER_BACKEND, analyse_order_document, find_anomalies
+from granskningar import STATUSES, ReviewStore
+from narmatchning import suggest_pairings, unmatched_orders
+from rapport import generate_pdf_report_async, read_report
+from rapportindex import ReportIndex, read_file
+from orderliggare import CONFIRMATION, INVOICE, LEDGER_PATH, OrderLedger, ledger_csv
+from orderindex import ORDER, OrderIndex
+from instrumentering import RunTimer, append_log, profiled
+from resultatlager import load_result, mismatched_orders, result_path, save_result
 
 HISTORY_DIR = "rapporthistorik"
 REVIEWED_DIR = "granskade_ordrar"
-os.makedirs(HISTORY_DIR, exist_ok=True)
-os.makedirs(REVIEWED_DIR, exist_ok=True)
+REVIEW_PAGE_SIZE = 50
+REVIEW_STATUS = ["OK", "EJ OK"]
 
 st.set_page_config(page_title="Jämförelse: Leverans vs Faktura", layout="centered")
 
@@ -25,125 +35,156 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def kontroll_pressglass():
-    def extract_orders_from_confirmation(pdf_file):
-        from PyPDF2 import PdfReader
-        reader = PdfReader(pdf_file)
-        text = "\n".join(page.extract_text() for page in reader.pages)
-        lines = text.splitlines()
-
-        orders = defaultdict(int)
-        current_order = None
-        found_qty = False
-
-        for i, line in enumerate(lines):
-            reorder_match = re.search(r"Reorder\s+(\d{7})", line)
-            if reorder_match:
-                current_order = reorder_match.group(1)
-                found_qty = False
-                continue
-
-            parts = line.strip().split()
-            if len(parts) >= 6:
-                possible_order = parts[3]
-                if re.fullmatch(r"\d{7}", possible_order):
-                    current_order = possible_order
-                    found_qty = False
-                    try:
-                        qty = int(parts[-1])
-                        if 0 < qty < 500:
-                            orders[current_order] += qty
-                            found_qty = True
-                    except ValueError:
-                        continue
-                    continue
-
-            if current_order and not found_qty:
-                fallback_qty_match = re.fullmatch(r"\s*(\d{1,3})\s*", line)
-                if fallback_qty_match:
-                    try:
-                        qty = int(fallback_qty_match.group(1))
-                        if 0 < qty < 500:
-                            orders[current_order] += qty
-                            found_qty = True
-                            current_order = None
-                    except ValueError:
-                        continue
-        return orders
-
-    def extract_orders_from_invoice(pdf_file):
-        orders = defaultdict(int)
-        invoice_id = ""
-
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                lines = page.extract_text().split("\n")
-                order_indices = []
-                invoice_id_match = re.search(r"Faktura(?:nr|nummer)[:\s]*([\w\d-]+)", " ".join(lines), re.IGNORECASE)
-                if invoice_id_match:
-                    invoice_id = invoice_id_match.group(1)
-
-                for idx, line in enumerate(lines):
-                    match = re.search(r"Zamówienie\s*/\s*Order:\s*(\d{7})", line)
-                    if match:
-                        order_indices.append((idx, match.group(1)))
-
-                order_indices.append((len(lines), None))
-
-                for i in range(len(order_indices) - 1):
-                    start, current_order = order_indices[i]
-                    end, _ = order_indices[i + 1]
-                    for j in range(start + 1, end):
-                        qty_match = re.search(r"P\s+(\d+(?:[.,]\d+)?)\s*pcs", lines[j], re.IGNORECASE)
-                        if qty_match:
-                            try:
-                                qty = int(float(qty_match.group(1).replace(",", ".")))
-                                if 0 < qty < 500:
-                                    orders[current_order] += qty
-                            except ValueError:
-                                continue
-        return orders, invoice_id
-
-    def compare_orders(confirmation, invoice):
-        all_orders = set(confirmation.keys()) | set(invoice.keys())
-        result = []
-        for order in sorted(all_orders):
-            leverans = confirmation.get(order, 0)
-            faktura = invoice.get(order, 0)
-            result.append({
-                "Ordernummer": order,
-                "Antal (Leveransbekräftelse)": leverans,
-                "Antal (Faktura)": faktura,
-                "Matchar?": "JA" if leverans == faktura else "NEJ"
-            })
-        return pd.DataFrame(result)
-
-    def generate_pdf_report(df, faktura_id, leverans_id):
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.set_fill_color(230, 230, 230)
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(0, 10, "Orderjämförelse: Leveransbekräftelse vs Faktura", ln=True)
-        pdf.ln(5)
-        pdf.set_font("Arial", 'B', 12)
-        headers = ["Ordernummer", "Antal (Leveransbekräftelse)", "Antal (Faktura)", "Matchar?"]
-        col_widths = [40, 70, 40, 30]
-        for i, header in enumerate(headers):
-            pdf.cell(col_widths[i], 10, header, 1, 0, 'C', fill=True)
-        pdf.ln()
-        pdf.set_font("Arial", size=12)
-        for _, row in df.iterrows():
-            pdf.cell(col_widths[0], 10, str(row["Ordernummer"]), 1)
-            pdf.cell(col_widths[1], 10, str(row["Antal (Leveransbekräftelse)"]), 1)
-            pdf.cell(col_widths[2], 10, str(row["Antal (Faktura)"]), 1)
-            pdf.cell(col_widths[3], 10, row["Matchar?"], 1)
-            pdf.ln()
-        filename = f"{faktura_id}-{leverans_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-        filepath = os.path.join(HISTORY_DIR, filename)
-        pdf.output(filepath)
-        return filepath
+@st.cache_resource
+def get_parse_cache():
+    return ParseCache()
+
+@st.cache_resource
+def get_report_index():
+    index = ReportIndex(HISTORY_DIR)
+    index.import_existing()
+    return index
+
+@st.cache_resource
+def get_order_ledger():
+    return OrderLedger()
+
+@st.cache_resource
+def get_order_index():
+    index = OrderIndex()
+    index.import_ledger(LEDGER_PATH)
+    return index
+
+@st.cache_resource
+def get_review_store():
+    store = ReviewStore(REVIEWED_DIR)
+    store.import_text_files()
+    return store
+
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+def show_timings(timer):
+    with st.expander(f"⏱️ Tidsåtgång ({timer.total():.2f} s)"):
+        st.dataframe(timer.stages, use_container_width=True, hide_index=True)
+
+def log_report_time(report, rows):
+    started = time.perf_counter()
+    report.add_done_callback(lambda _: append_log({
+        "tid": datetime.now().isoformat(timespec="seconds"),
+        "vy": "generate_pdf_report",
+        "sekunder": round(time.perf_counter() - started, 4),
+        "rader": rows,
+    }))
+
+def register_report(report, index, df, saved_path, faktura_id, leverans_id):
+    # Historiken får rapporten först när PDF:en finns; en misslyckad skrivning
+    # lämnar varken indexrad eller resultatfil efter sig.
+    def done(future):
+        if future.exception() is not None:
+            return
+        save_result(df, saved_path, faktura_id, leverans_id)
+        index.add(faktura_id, leverans_id, saved_path, ordrar=len(df), avvikelser=int((df["Matchar?"] == "NEJ").sum()))
+    report.add_done_callback(done)
+
+def run_comparison(job, cache, index, ledger, order_index, conf_data, fakt_data, conf_name, fakt_name, supplier):
+    # Körs i jobbkön utan Streamlit-anrop; resultatet visas när sidan hämtar jobbet.
+    timer = RunTimer("kontroll_pressglass")
+    leverans_id = os.path.splitext(conf_name)[0]
+    with profiled("kontroll_pressglass"):
+        # Dokumenten öppnas bara om de inte redan finns i tolkningscachen; bara
+        # sidor som faktiskt tolkas räknas in i förloppet.
+        confirmation_postings = timer.parse(
+            "tolkning: leveransbekräftelse", cache, f"bekraftelse-{supplier}", conf_data,
+            layout(supplier, "bekraftelse").backend,
+            partial(extract_confirmation_postings, supplier=supplier, progress=job.advance), job.add_pages)
+        invoice_postings, faktura_id = timer.parse(
+            "tolkning: faktura", cache, f"faktura-{supplier}", fakt_data, layout(supplier, "faktura").backend,
+            partial(extract_invoice_postings, supplier=supplier, progress=job.advance), job.add_pages)
+        confirmation_orders, faktura_orders = sum_postings(confirmation_postings), sum_postings(invoice_postings)
+        conf_digest, fakt_digest = content_hash(conf_data), content_hash(fakt_data)
+        # Samma par av dokument ger samma jämförelse, oavsett vem som laddar upp dem.
+        pair_digest = combined_hash(conf_digest, fakt_digest)
+        df = timer.cached("compare_orders", cache, f"jamforelse-{supplier}", pair_digest,
+                          partial(compare_orders, confirmation_orders, faktura_orders))
+        with timer.stage("närmatchning"):
+            suggestions = suggest_pairings(*unmatched_orders(df))
+
+        # Rapporten skrivs i bakgrunden; knappen väntar in den först vid nedladdning.
+        with timer.stage("generate_pdf_report (start)"):
+            saved_path, report = generate_pdf_report_async(df, faktura_id or "Faktura", leverans_id, HISTORY_DIR)
+            log_report_time(report, len(df))
+            register_report(report, index, df, saved_path, faktura_id or "Faktura", leverans_id)
+        # Dokumenten läggs till i orderliggaren och orderindexet; ett dokument
+        # som redan finns där räknas inte två gånger.
+        with timer.stage("orderliggare + orderindex"):
+            ledger.add_document(CONFIRMATION, conf_digest, leverans_id, confirmation_orders, supplier)
+            ledger.add_document(INVOICE, fakt_digest, faktura_id or "Faktura", faktura_orders, supplier)
+            order_index.add_document(CONFIRMATION, conf_digest, leverans_id, confirmation_postings, conf_name)
+            order_index.add_document(INVOICE, fakt_digest, faktura_id or "Faktura", invoice_postings, fakt_name)
+    timer.log()
+    return {"df": df, "saved_path": saved_path, "report": report, "suggestions": suggestions, "timer": timer}
+
+def run_registration(job, cache, ledger, order_index, data, filename, kind, supplier):
+    timer = RunTimer("orderliggare")
+    name = os.path.splitext(filename)[0]
+    backend = layout(supplier, kind).backend
+    if kind == CONFIRMATION:
+        postings = timer.parse(
+            "tolkning: leveransbekräftelse", cache, f"bekraftelse-{supplier}", data, backend,
+            partial(extract_confirmation_postings, supplier=supplier, progress=job.advance), job.add_pages)
+    else:
+        postings, faktura_id = timer.parse(
+            "tolkning: faktura", cache, f"faktura-{supplier}", data, backend,
+            partial(extract_invoice_postings, supplier=supplier, progress=job.advance), job.add_pages)
+        name = faktura_id or name
+    digest = content_hash(data)
+    with timer.stage("orderliggare + orderindex"):
+        touched = ledger.add_document(kind, digest, name, sum_postings(postings), supplier)
+        order_index.add_document(kind, digest, name, postings, filename)
+    timer.log()
+    return {"touched": touched, "timer": timer}
+
+def run_review(job, cache, order_index, order_data, filename):
+    timer = RunTimer("orderkontroll")
+    with profiled("orderkontroll"):
+        analysis = timer.parse(
+            "tolkning: avvikelseanalys", cache, "orderdokument", order_data, ORDER_BACKEND,
+            partial(analyse_order_document, progress=job.advance), job.add_pages)
+        with timer.stage("orderindex"):
+            order_index.add_document(ORDER, content_hash(order_data), os.path.splitext(filename)[0],
+                                     [(order, page, None) for order, page in analysis["referenser"]], filename)
+    timer.log()
+    # Avvikelserna räknas fram vid visning, mot baslinjen som den är då.
+    return {"attribut": analysis["attribut"], "timer": timer}
+
+@st.fragment(run_every=1)
+def job_progress(job_id):
+    # Bara förloppet uppdateras varje sekund; hela sidan körs om när jobbet är klart.
+    job = get_job_queue().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    st.progress(job.fraction(), text=job.describe())
+
+def finished_job(job_id, retry=None):
+    # retry: startar om jobbet när användaren trycker på "Försök igen".
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.info("Jobbet finns inte längre, starta det igen.")
+        return None
+    if not job.finished:
+        job_progress(job.id)
+        return None
+    if job.status == FAILED:
+        st.error(f"{job.label} misslyckades: {job.error}")
+        if retry is not None and st.button("🔁 Försök igen", key=f"igen_{job.id}"):
+            retry()
+            st.rerun()
+        return None
+    return job
 
+def kontroll_pressglass():
     st.markdown("### Ladda upp leveransbekräftelse och faktura som PDF")
     col1, col2 = st.columns(2)
     with col1:
@@ -151,123 +192,301 @@ def kontroll_pressglass():
     with col2:
         fakt_file = st.file_uploader("Ladda upp faktura", type="pdf", key="fakt")
 
+    supplier = st.selectbox("Leverantörsformat", sorted(SUPPLIERS), index=sorted(SUPPLIERS).index(DEFAULT_SUPPLIER),
+                            key="leverantor")
+
     result_container = st.container()
     if conf_file and fakt_file:
         if st.button("✅ Jämför dokument"):
-            confirmation_orders = extract_orders_from_confirmation(conf_file)
-            faktura_orders, faktura_id = extract_orders_from_invoice(fakt_file)
-            df = compare_orders(confirmation_orders, faktura_orders)
-            leverans_id = os.path.splitext(conf_file.name)[0]
+            conf_data, fakt_data = conf_file.getvalue(), fakt_file.getvalue()
+            job = get_job_queue().submit(
+                "jamforelse", f"Jämförelse {os.path.splitext(conf_file.name)[0]}", run_comparison,
+                get_parse_cache(), get_report_index(), get_order_ledger(), get_order_index(),
+                conf_data, fakt_data, conf_file.name, fakt_file.name, supplier,
+                key=("jamforelse", supplier, conf_file.name, content_hash(conf_data), content_hash(fakt_data)),
+                retry=True)
+            st.session_state["jamforelse_jobb"] = job.id
+
+    # Jobbet lever kvar i kön, så resultatet överlever omkörningar av sidan.
+    job_id = st.session_state.get("jamforelse_jobb")
+    if job_id:
+        with result_container:
+            job = finished_job(job_id)
+        if job is not None:
+            result = job.result
             st.success("Jämförelsen är klar!")
             with result_container:
-                st.dataframe(df, use_container_width=True, height=700)
+                st.dataframe(result["df"], use_container_width=True, height=700)
+            st.download_button("🔗 Ladda ner PDF-rapport", data=partial(read_report, result["report"]),
+                               file_name=os.path.basename(result["saved_path"]), mime="application/pdf",
+                               on_click="ignore")
+            if result["suggestions"]:
+                with st.expander(f"🔎 Möjliga felskrivna ordernummer ({len(result['suggestions'])})", expanded=True):
+                    st.caption("Ordrar som bara finns i ena dokumentet men nästan matchar en order i det andra.")
+                    st.dataframe(result["suggestions"], use_container_width=True, hide_index=True,
+                                 column_config={"Säkerhet": st.column_config.ProgressColumn(
+                                     "Säkerhet", min_value=0, max_value=1, format="%.2f")})
+            with st.expander("📒 Löpande status i orderliggaren"):
+                # Läses vid visning så att dokument som registrerats senare också räknas.
+                st.dataframe(get_order_ledger().orders(result["df"]["Ordernummer"]),
+                             use_container_width=True, hide_index=True)
+            show_timings(result["timer"])
+
+def orderliggare():
+    st.info("Bekräftade och fakturerade antal per order, summerade över alla registrerade dokument.")
+    ledger = get_order_ledger()
+    with st.expander("Registrera ett enskilt dokument"):
+        document = st.file_uploader("Leveransbekräftelse eller faktura (PDF)", type="pdf", key="liggare_pdf")
+        kind = st.radio("Dokumenttyp", [CONFIRMATION, INVOICE], horizontal=True, key="liggare_typ",
+                        format_func={CONFIRMATION: "Leveransbekräftelse", INVOICE: "Faktura"}.get)
+        supplier = st.selectbox("Leverantörsformat", sorted(SUPPLIERS),
+                                index=sorted(SUPPLIERS).index(DEFAULT_SUPPLIER), key="liggare_leverantor")
+        if document and st.button("Registrera"):
+            data = document.getvalue()
+            job = get_job_queue().submit(
+                "orderliggare", f"Registrering {document.name}", run_registration,
+                get_parse_cache(), ledger, get_order_index(), data, document.name, kind, supplier,
+                key=("orderliggare", kind, supplier, content_hash(data)), retry=True)
+            st.session_state["liggare_jobb"] = job.id
+        job_id = st.session_state.get("liggare_jobb")
+        if job_id:
+            job = finished_job(job_id)
+            if job is not None:
+                if job.result["touched"] is None:
+                    st.info("Dokumentet finns redan i orderliggaren.")
+                else:
+                    st.success(f"{len(job.result['touched'])} ordrar uppdaterade.")
+
+    page_size = 50
+    search = st.text_input("Sök på ordernummer", key="liggare_sok")
+    only_open = st.checkbox("Visa bara ordrar där antalen skiljer sig", key="liggare_oppna")
+    total = ledger.count(search, only_open)
+    pages = max(1, -(-total // page_size))
+    page = st.number_input(f"Sida (av {pages}, {total} ordrar)", min_value=1, max_value=pages, value=1,
+                           key="liggare_sida")
+    rows = ledger.search(search, only_open, limit=page_size, offset=(page - 1) * page_size)
+    st.download_button("Ladda ner hela orderliggaren (CSV)", data=partial(ledger_csv, ledger),
+                       file_name="orderliggare.csv", mime="text/csv", on_click="ignore")
+    if not rows:
+        st.write("Inga ordrar hittades.")
+        return
+    selection = st.dataframe(rows, use_container_width=True, hide_index=True, on_select="rerun",
+                             selection_mode="single-row", key="liggare_tabell")
+    if selection.selection.rows:
+        order = rows[selection.selection.rows[0]]["Ordernummer"]
+        st.markdown(f"**Dokument för order {order}**")
+        st.dataframe(ledger.documents(order), use_container_width=True, hide_index=True)
 
-            saved_path = generate_pdf_report(df, faktura_id or "Faktura", leverans_id)
-            with open(saved_path, "rb") as f:
-                st.download_button("🔗 Ladda ner PDF-rapport", data=f, file_name=os.path.basename(saved_path))
-                
 def rapporthistorik():
     st.info("Tidigare jämförelser som PDF.")
-    history_files = sorted(os.listdir(HISTORY_DIR), reverse=True)
-    for file in history_files:
-        filepath = os.path.join(HISTORY_DIR, file)
-        with open(filepath, "rb") as f:
-            st.download_button(file, data=f, file_name=file, key=file)
-
-def extract_text_blocks_from_pdf(pdf_file):
-    with pdfplumber.open(pdf_file) as pdf:
-        lines = []
-        for page in pdf.pages:
-            text = page.extract_text()
-            if text:
-                lines.extend(text.splitlines())
-    return lines
-
-def detect_pdf_anomalies(text_lines):
-    blocks = []
-    block = []
-    for line in text_lines:
-        if re.match(r"Rad\s*\d+", line):
-            if block:
-                blocks.append(block)
-            block = [line]
-        else:
-            block.append(line)
-    if block:
-        blocks.append(block)
-
-    anomaly_report = []
-    colors = [line for group in blocks for line in group if any(color in line.lower() for color in ["vit", "röd", "svart"])]
-    common_color = max(set(colors), key=colors.count) if colors else None
-
-    for block in blocks:
-        color_lines = [line for line in block if any(color in line.lower() for color in ["vit", "röd", "svart"])]
-        for color in color_lines:
-            if color != common_color:
-                header = f"{block[0]} - {next((l for l in block if 'AF' in l or 'AVF' in l), '')}"
-                anomaly_report.append({
-                    "Header": header,
-                    "Detaljer": [l for l in block[1:] if l != color],
-                    "Avvikelse": color,
-                    "Förväntat": common_color
-                })
-    return anomaly_report
+    page_size = 20
+    search = st.text_input("Sök på faktura- eller leverans-id", key="historik_sok")
+    index = get_report_index()
+    total = index.count(search)
+    pages = max(1, -(-total // page_size))
+    page = st.number_input(f"Sida (av {pages})", min_value=1, max_value=pages, value=1, key="historik_sida")
+    reports = index.search(search, limit=page_size, offset=(page - 1) * page_size)
+    if not reports:
+        st.write("Inga rapporter hittades.")
+
+    shown = st.session_state.get("historik_visa")
+    if shown:
+        stored = load_result(shown)
+        if stored is not None:
+            st.markdown(f"**Resultat: {os.path.basename(shown)}**")
+            st.dataframe(stored, use_container_width=True, height=400)
+        if st.button("Stäng resultat"):
+            st.session_state["historik_visa"] = None
+            st.rerun()
+
+    for report in reports:
+        filename = os.path.basename(report["sokvag"])
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            mismatches = "" if report["avvikelser"] is None else f" – {report['avvikelser']} avvikelser av {report['ordrar']}"
+            st.markdown(f"**{report['faktura_id']}** / {report['leverans_id']} – {report['skapad']}{mismatches}")
+        with col2:
+            if os.path.exists(result_path(report["sokvag"])) and st.button("Visa", key=f"visa_{report['id']}"):
+                st.session_state["historik_visa"] = report["sokvag"]
+                st.rerun()
+        with col3:
+            # Filen läses först när användaren laddar ner just den rapporten.
+            st.download_button("Ladda ner", data=partial(read_file, report["sokvag"]), file_name=filename,
+                               mime="application/pdf", key=f"rapport_{report['id']}", on_click="ignore")
+
+    with st.expander("Ordrar som avvikit i någon jämförelse"):
+        if st.button("Sök i alla sparade resultat"):
+            st.dataframe(mismatched_orders(HISTORY_DIR), use_container_width=True)
+
+@st.fragment
+def review_anomalies(review_key, order_name, digest):
+    # Avvikelserna och deras status ligger i sessionen för hela granskningen;
+    # bara den synliga sidan ritas, och ändringar kör om enbart det här fragmentet.
+    review = st.session_state[review_key]
+    anomalies, statuses = review["avvikelser"], review["status"]
+    pages = max(1, -(-len(anomalies) // REVIEW_PAGE_SIZE))
+    page = st.number_input(f"Sida (av {pages}, {len(anomalies)} avvikelser)", min_value=1, max_value=pages,
+                           value=1, key=f"{review_key}_sida")
+    start = (page - 1) * REVIEW_PAGE_SIZE
+    rows = [{
+        "Rad": anomaly["Header"],
+        "Attribut": anomaly["Attribut"],
+        "Avvikelse": anomaly["Avvikelse"],
+        "Förväntat": anomaly["Förväntat"],
+        "Andel EJ OK tidigare": anomaly["Andel EJ OK"],
+        "Detaljer": " · ".join(anomaly["Detaljer"]),
+        "Status": statuses[start + i],
+    } for i, anomaly in enumerate(anomalies[start:start + REVIEW_PAGE_SIZE])]
+    edited = st.data_editor(
+        rows, key=f"{review_key}_{review['omgang']}_{page}", hide_index=True, use_container_width=True,
+        disabled=["Rad", "Attribut", "Avvikelse", "Förväntat", "Andel EJ OK tidigare", "Detaljer"],
+        column_config={
+            "Status": st.column_config.SelectboxColumn("Status", options=REVIEW_STATUS, required=True),
+            "Andel EJ OK tidigare": st.column_config.ProgressColumn(
+                "Andel EJ OK tidigare", min_value=0, max_value=1, format="%.2f"),
+        },
+    )
+    for i, row in enumerate(edited):
+        statuses[start + i] = row["Status"]
+    st.caption(f"{statuses.count(REVIEW_STATUS[1])} av {len(statuses)} markerade som {REVIEW_STATUS[1]}.")
+
+    reviewer = st.text_input("Granskare", key="granskare").strip()
+    if st.button("✔️ Klar"):
+        get_review_store().add_review(os.path.splitext(order_name)[0], list(zip(anomalies, statuses)),
+                                      reviewer=reviewer or None, digest=digest)
+        # Nästa visning räknar om avvikelserna mot den uppdaterade baslinjen.
+        del st.session_state[review_key]
+        st.session_state["granskning_sparad"] = order_name
+        st.rerun(scope="app")
+
+def ordersok():
+    st.info("Sök i vilka leveransbekräftelser, fakturor och ordrar ett ordernummer förekommer.")
+    text = st.text_input("Ordernummer (helt eller början)", max_chars=7, key="ordersok").strip()
+    if not text:
+        return
+    if not text.isdigit():
+        st.warning("Ordernummer består bara av siffror.")
+        return
+    started = time.perf_counter()
+    hits = get_order_index().lookup(text)
+    st.caption(f"{len(hits)} träffar på {(time.perf_counter() - started) * 1000:.1f} ms")
+    if not hits:
+        st.write("Ordernumret finns inte i något registrerat dokument.")
+        return
+    st.dataframe(hits, use_container_width=True, hide_index=True)
+    if len(text) == 7:
+        totals = get_order_ledger().orders([text])
+        if totals:
+            st.markdown("**Löpande status i orderliggaren**")
+            st.dataframe(totals, use_container_width=True, hide_index=True)
 
 def orderkontroll():
     st.info("Ladda upp en order som PDF med information om fönster, färg, spröjs etc.")
     order_pdf = st.file_uploader("Order (PDF)", type="pdf", key="order_pdf")
     if order_pdf:
-        lines = extract_text_blocks_from_pdf(order_pdf)
+        order_data = order_pdf.getvalue()
+        digest = content_hash(order_data)
+        # Varje omkörning hämtar samma jobb; ett misslyckat jobb körs om först på begäran.
+        submit_review = partial(
+            get_job_queue().submit, "orderkontroll", f"Granskning {order_pdf.name}", run_review,
+            get_parse_cache(), get_order_index(), order_data, order_pdf.name,
+            key=("orderkontroll", digest))
+        job = finished_job(submit_review().id, retry=partial(submit_review, retry=True))
+        if job is None:
+            return
+        saved = st.session_state.pop("granskning_sparad", None)
+        if saved:
+            st.success(f"Granskningen av {saved} är sparad.")
+        # Avvikelserna räknas fram mot den aktuella baslinjen när en granskning
+        # börjar och hålls sedan fast, så att statuslistan alltid hör ihop med dem.
+        review_key = f"granskning_{digest[:16]}"
+        if review_key not in st.session_state:
+            anomalies = find_anomalies(job.result["attribut"], get_review_store().baseline)
+            st.session_state[review_key] = {"avvikelser": anomalies, "status": [REVIEW_STATUS[0]] * len(anomalies),
+                                            "omgang": uuid.uuid4().hex[:8]}
         st.subheader("🔍 Avvikelseanalys")
-        anomalies = detect_pdf_anomalies(lines)
-        if not anomalies:
+        if not st.session_state[review_key]["avvikelser"]:
             st.success("Ingen tydlig avvikelse hittad.")
         else:
-            feedback_list = []
-            for i, anomaly in enumerate(anomalies):
-                st.markdown(f"**{anomaly['Header']}**")
-                for detail in anomaly['Detaljer']:
-                    st.markdown(f"<p style='margin:0 0 2px 10px;'>{detail}</p>", unsafe_allow_html=True)
-                response = st.radio("Status", ["OK", "EJ OK"], key=f"feedback_{i}")
-                feedback_list.append((anomaly, response))
-                st.markdown("---")
-            if st.button("✔️ Klar"):
-                filename = os.path.splitext(order_pdf.name)[0] + "_granskning.txt"
-                filepath = os.path.join(REVIEWED_DIR, filename)
-                with open(filepath, "w", encoding="utf-8") as f:
-                    for anomaly, response in feedback_list:
-                        f.write(f"{anomaly['Header']} – {anomaly['Avvikelse']} – Förväntat: {anomaly['Förväntat']} – Status: {response}\n")
-                st.success("Granskningen är sparad.")
+            review_anomalies(review_key, order_pdf.name, digest)
+        show_timings(job.result["timer"])
 
 def granskade_ordrar():
-    st.info("Sparade granskningar.")
-    reviewed_files = sorted(os.listdir(REVIEWED_DIR), reverse=True)
-    for file in reviewed_files:
-        filepath = os.path.join(REVIEWED_DIR, file)
-        with open(filepath, "r", encoding="utf-8") as f:
-            st.text(f"{file}\n{'-'*len(file)}\n{f.read()}\n")
+    st.info("Sparade granskningar. Filtrera till exempel på EJ OK för ett attribut och en tidsperiod.")
+    store = get_review_store()
+    col1, col2 = st.columns(2)
+    statuses = col1.multiselect("Status", STATUSES, key="granskade_status")
+    attribute = col2.selectbox("Attribut", [""] + list(ATTRIBUTES), key="granskade_attribut",
+                               format_func=lambda name: name or "Alla")
+    col1, col2 = st.columns(2)
+    text = col1.text_input("Avvikelse innehåller (t.ex. en färg)", key="granskade_text").strip()
+    order = col2.text_input("Order", key="granskade_order").strip()
+    period = st.date_input("Granskad", value=(date.today() - timedelta(days=30), date.today()),
+                           key="granskade_period")
+    # Under tiden ett intervall väljs finns bara startdatumet.
+    since, until = (tuple(period) + (None, None))[:2]
+    filters = {"statuses": statuses, "attribute": attribute, "text": text, "order": order,
+               "since": since, "until": until}
+
+    total = store.count(**filters)
+    if not total:
+        st.write("Inga granskningar matchar filtret.")
+        return
+    page_size = REVIEW_PAGE_SIZE
+    pages = max(1, -(-total // page_size))
+    page = st.number_input(f"Sida (av {pages}, {total} rader)", min_value=1, max_value=pages, value=1,
+                           key="granskade_sida")
+    st.dataframe(store.search(limit=page_size, offset=(page - 1) * page_size, **filters),
+                 use_container_width=True, hide_index=True)
 
 def testyta():
     st.warning("Detta är en testyta för framtida funktioner. Här kan du experimentera utan att påverka något annat.")
+    st.markdown("#### Delad tolkningscache")
+    stats = get_parse_cache().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Träffar", stats["träffar"])
+    col2.metric("Missar", stats["missar"])
+    col3.metric("Poster i minnet", stats["poster"])
+    col4.metric("Minne", f"{stats['minne_byte'] / 1024 / 1024:.1f} MB")
+    if stats["per_typ"]:
+        st.dataframe([{"Typ": kind, "Utfall": outcome, "Antal": count}
+                      for (kind, outcome), count in sorted(stats["per_typ"].items())],
+                     use_container_width=True, hide_index=True)
 
 # Huvudgränssnitt
 st.title("🧠 Orderkontrollsystem")
 
-main_tabs = st.tabs(["📦 Kontroll Pressglass", "🧾 Orderkontroll", "🧪 Testyta"])
+# Flikarnas läge spåras så att bara den valda fliken körs; tunga bibliotek
+# (pandas, pdfplumber, fpdf, pyarrow) laddas först när en flik behöver dem.
+main_tabs = st.tabs(["📦 Kontroll Pressglass", "🧾 Orderkontroll", "🧪 Testyta"], key="huvudflik", on_change="rerun")
 
 with main_tabs[0]:
-    sub_tabs = st.tabs(["Jämförelse", "Rapporthistorik"])
-    with sub_tabs[0]:
-        kontroll_pressglass()
-    with sub_tabs[1]:
-        rapporthistorik()
+    if main_tabs[0].open:
+        sub_tabs = st.tabs(["Jämförelse", "Rapporthistorik", "Orderliggare", "Sök order"], key="pressglassflik",
+                           on_change="rerun")
+        with sub_tabs[0]:
+            if sub_tabs[0].open:
+                kontroll_pressglass()
+        with sub_tabs[1]:
+            if sub_tabs[1].open:
+                rapporthistorik()
+        with sub_tabs[2]:
+            if sub_tabs[2].open:
+                orderliggare()
+        with sub_tabs[3]:
+            if sub_tabs[3].open:
+                ordersok()
 
 with main_tabs[1]:
-    sub_tabs2 = st.tabs(["Granskning", "Granskade ordrar"])
-    with sub_tabs2[0]:
-        orderkontroll()
-    with sub_tabs2[1]:
-        granskade_ordrar()
+    if main_tabs[1].open:
+        sub_tabs2 = st.tabs(["Granskning", "Granskade ordrar"], key="orderflik", on_change="rerun")
+        with sub_tabs2[0]:
+            if sub_tabs2[0].open:
+                orderkontroll()
+        with sub_tabs2[1]:
+            if sub_tabs2[1].open:
+                granskade_ordrar()
 
 with main_tabs[2]:
-    testyta()
+    if main_tabs[2].open:
+        testyta()
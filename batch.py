@@ -0,0 +1,164 @@
+import argparse
+import csv
+import json
+import os
+import sys
+
+from narmatchning import suggest_pairings, unmatched_orders
+from parallel import process_pool, resolve_workers
+from pressglass import extract_orders_from_confirmation, extract_orders_from_invoice, compare_orders
+from suppliers import DEFAULT_SUPPLIER, SUPPLIERS
+
+
+def pair_directories(conf_dir, fakt_dir):
+    def pdfs(directory):
+        return {
+            os.path.splitext(name)[0]: os.path.join(directory, name)
+            for name in sorted(os.listdir(directory))
+            if name.lower().endswith(".pdf")
+        }
+
+    confirmations = pdfs(conf_dir)
+    invoices = pdfs(fakt_dir)
+    pairs = [(confirmations[stem], invoices[stem]) for stem in sorted(confirmations.keys() & invoices.keys())]
+    unpaired = sorted(
+        [(confirmations[stem], "") for stem in confirmations.keys() - invoices.keys()]
+        + [("", invoices[stem]) for stem in invoices.keys() - confirmations.keys()]
+    )
+    return pairs, unpaired
+
+
+def read_manifest(manifest_path):
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    pairs = []
+    with open(manifest_path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip() or row[0].startswith("#"):
+                continue
+            if row[0].strip().lower() in ("bekraftelse", "bekräftelse", "leveransbekräftelse"):
+                continue
+            conf_path, fakt_path = (os.path.join(base, value.strip()) for value in row[:2])
+            pairs.append((conf_path, fakt_path))
+    return pairs
+
+
+def reconcile_pair(conf_path, fakt_path, page_workers=1, supplier=DEFAULT_SUPPLIER):
+    confirmation_orders = extract_orders_from_confirmation(conf_path, supplier)
+    faktura_orders, faktura_id = extract_orders_from_invoice(fakt_path, workers=page_workers, supplier=supplier)
+    df = compare_orders(confirmation_orders, faktura_orders)
+    leverans_id = os.path.splitext(os.path.basename(conf_path))[0]
+    return df, faktura_id or os.path.splitext(os.path.basename(fakt_path))[0], leverans_id
+
+
+def write_result(df, output_dir, name, formats):
+    if "csv" in formats:
+        df.to_csv(os.path.join(output_dir, f"{name}.csv"), index=False)
+    if "json" in formats:
+        df.to_json(os.path.join(output_dir, f"{name}.json"), orient="records", force_ascii=False, indent=2)
+
+
+def write_suggestions(suggestions, output_dir, name):
+    # Förslag på felskrivna ordernummer, bara när det finns några.
+    if not suggestions:
+        return
+    with open(os.path.join(output_dir, f"{name}-forslag.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(suggestions[0]))
+        writer.writeheader()
+        writer.writerows(suggestions)
+
+
+def reconcile_pairs(pairs, workers, supplier=DEFAULT_SUPPLIER):
+    # Ett dokumentpar per process; med ett enda par delas sidorna upp i stället.
+    if workers > 1 and len(pairs) > 1:
+        with process_pool(min(workers, len(pairs))) as pool:
+            futures = [pool.submit(reconcile_pair, conf_path, fakt_path, 1, supplier) for conf_path, fakt_path in pairs]
+            for (conf_path, fakt_path), future in zip(pairs, futures):
+                try:
+                    yield conf_path, fakt_path, future.result(), None
+                except Exception as exc:
+                    yield conf_path, fakt_path, None, exc
+        return
+    for conf_path, fakt_path in pairs:
+        try:
+            yield conf_path, fakt_path, reconcile_pair(conf_path, fakt_path, workers, supplier), None
+        except Exception as exc:
+            yield conf_path, fakt_path, None, exc
+
+
+def run(pairs, output_dir, formats, unpaired=(), workers=1, supplier=DEFAULT_SUPPLIER):
+    os.makedirs(output_dir, exist_ok=True)
+    summary = []
+    for conf_path, fakt_path, result, exc in reconcile_pairs(pairs, resolve_workers(workers), supplier):
+        entry = {"bekraftelse": conf_path, "faktura": fakt_path}
+        if exc is not None:
+            entry.update(status="fel", fel=f"{type(exc).__name__}: {exc}")
+            summary.append(entry)
+            print(f"FEL  {conf_path} / {fakt_path}: {exc}", file=sys.stderr)
+            continue
+        df, faktura_id, leverans_id = result
+        name = f"{faktura_id}-{leverans_id}"
+        write_result(df, output_dir, name, formats)
+        suggestions = suggest_pairings(*unmatched_orders(df))
+        write_suggestions(suggestions, output_dir, name)
+        mismatches = int((df["Matchar?"] == "NEJ").sum()) if not df.empty else 0
+        entry.update(
+            status="ok",
+            faktura_id=faktura_id,
+            leverans_id=leverans_id,
+            ordrar=len(df),
+            avvikelser=mismatches,
+            forslag=len(suggestions),
+            resultat=name,
+        )
+        summary.append(entry)
+        print(f"{'OK ' if mismatches == 0 else 'NEJ'}  {name}: {len(df)} ordrar, {mismatches} avvikelser")
+    for conf_path, fakt_path in unpaired:
+        summary.append({"bekraftelse": conf_path, "faktura": fakt_path, "status": "saknar par"})
+
+    with open(os.path.join(output_dir, "sammanfattning.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    fields = ["status", "bekraftelse", "faktura", "faktura_id", "leverans_id", "ordrar", "avvikelser", "forslag",
+              "resultat", "fel"]
+    with open(os.path.join(output_dir, "sammanfattning.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(summary)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Jämför leveransbekräftelser och fakturor från Pressglass utan Streamlit."
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--bekraftelser", metavar="KATALOG",
+                        help="katalog med leveransbekräftelser (paras med --fakturor på filnamn)")
+    source.add_argument("--manifest", metavar="CSV",
+                        help="CSV med kolumnerna bekräftelse,faktura per rad")
+    parser.add_argument("--fakturor", metavar="KATALOG", help="katalog med fakturor")
+    parser.add_argument("-o", "--utdata", default="batchresultat", help="katalog för resultat (standard: %(default)s)")
+    parser.add_argument("--format", choices=["csv", "json", "båda"], default="båda")
+    parser.add_argument("--leverantor", choices=sorted(SUPPLIERS), default=DEFAULT_SUPPLIER,
+                        help="leverantörsformat för tolkningen (standard: %(default)s)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="antal processer, 0 = en per kärna (standard: $ORDERKONTROLL_WORKERS eller 1)")
+    args = parser.parse_args(argv)
+
+    if args.bekraftelser and not args.fakturor:
+        parser.error("--bekraftelser kräver --fakturor")
+
+    unpaired = []
+    if args.manifest:
+        pairs = read_manifest(args.manifest)
+    else:
+        pairs, unpaired = pair_directories(args.bekraftelser, args.fakturor)
+    formats = {"csv", "json"} if args.format == "båda" else {args.format}
+
+    summary = run(pairs, args.utdata, formats, unpaired, workers=args.workers, supplier=args.leverantor)
+    failed = sum(1 for entry in summary if entry["status"] != "ok")
+    print(f"{len(summary) - failed}/{len(summary)} par jämförda, resultat i {args.utdata}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
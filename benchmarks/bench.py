@@ -0,0 +1,137 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from orderanalys import detect_pdf_anomalies, iter_text_lines  # noqa: E402
+from pressglass import compare_orders, extract_orders_from_confirmation, extract_orders_from_invoice  # noqa: E402
+from rapport import write_pdf_report  # noqa: E402
+from syntetiska import generate  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "data")
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+DEFAULT_SIZES = [1, 10, 100, 1000]
+STAGES = ["bekraftelse", "faktura", "jamforelse", "avvikelser", "rapport"]
+
+
+def _run_stage(stage, paths):
+    if stage == "bekraftelse":
+        return len(extract_orders_from_confirmation(paths["bekraftelse"]))
+    if stage == "faktura":
+        return len(extract_orders_from_invoice(paths["faktura"])[0])
+    if stage == "avvikelser":
+        return len(detect_pdf_anomalies(iter_text_lines(paths["order"])))
+
+    confirmation = extract_orders_from_confirmation(paths["bekraftelse"])
+    invoice, _ = extract_orders_from_invoice(paths["faktura"])
+    # pandas laddas först vid första jämförelsen; importtiden mäts av starttid.py.
+    compare_orders({}, {})
+    started = time.perf_counter()
+    df = compare_orders(confirmation, invoice)
+    if stage == "jamforelse":
+        return len(df), time.perf_counter() - started
+    started = time.perf_counter()
+    write_pdf_report(df, os.path.join(DATA_DIR, "rapport.pdf"))
+    return len(df), time.perf_counter() - started
+
+
+def _measure(stage, paths, queue):
+    # Körs i en egen process så att toppminnet (RSS) gäller just detta steg.
+    started = time.perf_counter()
+    result = _run_stage(stage, paths)
+    elapsed = time.perf_counter() - started
+    if isinstance(result, tuple):
+        result, elapsed = result
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, peak_kb / 1024, result))
+
+
+def measure(stage, paths):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(stage, paths, queue))
+    process.start()
+    elapsed, peak_mb, result = queue.get()
+    process.join()
+    return elapsed, peak_mb, result
+
+
+def run(sizes, stages, repeat):
+    results = {}
+    for pages in sizes:
+        paths = generate(DATA_DIR, pages)
+        for stage in stages:
+            runs = [measure(stage, paths) for _ in range(repeat)]
+            elapsed = min(run[0] for run in runs)
+            peak_mb = max(run[1] for run in runs)
+            key = f"{stage}/{pages}"
+            results[key] = {
+                "sekunder": round(elapsed, 4),
+                "sidor_per_sekund": round(pages / elapsed, 1) if elapsed else None,
+                "topp_rss_mb": round(peak_mb, 1),
+                "antal": runs[0][2],
+            }
+            print(f"{key:<20} {elapsed:9.3f} s {results[key]['sidor_per_sekund'] or 0:10.1f} sidor/s "
+                  f"{peak_mb:8.1f} MB  ({runs[0][2]} st)")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Ett ändrat antal betyder att tolkningen ger ett annat resultat; det
+    # räknas alltid som regression, oavsett tid.
+    regressions = []
+    print()
+    print(f"{'steg/sidor':<20} {'baslinje':>10} {'nu':>10} {'kvot':>7}")
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        flags = []
+        if previous.get("antal") is not None and current["antal"] != previous["antal"]:
+            flags.append(f"ANTAL {previous['antal']} -> {current['antal']}")
+        ratio = current["sekunder"] / previous["sekunder"] if previous["sekunder"] else 1.0
+        if ratio > 1 + tolerance:
+            flags.append("LÅNGSAMMARE")
+        print(f"{key:<20} {previous['sekunder']:10.3f} {current['sekunder']:10.3f} {ratio:7.2f}"
+              f"{'  ' + ', '.join(flags) if flags else ''}")
+        if flags:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Prestandamätning av tolkning, jämförelse och rapport på syntetiska Pressglass-PDF:er."
+    )
+    parser.add_argument("--sidor", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="dokumentstorlekar i sidor (standard: %(default)s)")
+    parser.add_argument("--steg", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--upprepa", type=int, default=1, help="körningar per mätning, bästa tiden räknas")
+    parser.add_argument("--spara-baslinje", action="store_true", help=f"skriv resultatet till {BASELINE_PATH}")
+    parser.add_argument("--tolerans", type=float, default=0.2,
+                        help="tillåten försämring mot baslinjen innan mätningen räknas som regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.sidor, args.steg, args.upprepa)
+
+    if args.spara_baslinje:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baslinje sparad i {BASELINE_PATH}")
+        return 0
+    if not os.path.exists(BASELINE_PATH):
+        print("Ingen baslinje att jämföra med, kör med --spara-baslinje först.")
+        return 0
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        baseline = json.load(f)
+    return 1 if compare(results, baseline, args.tolerans) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import argparse
+import ast
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app_beta.py")
+# Bibliotek som ska laddas först när en flik faktiskt behöver dem.
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "pdfplumber", "pypdfium2", "PyPDF2", "fpdf"]
+
+
+def project_modules():
+    return {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+
+
+def app_modules(path=APP_PATH):
+    # Projektets moduler som appen importerar på toppnivå, dvs. vid kallstart.
+    # Importer inuti funktioner sker först när de behövs och räknas inte.
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    own = project_modules()
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        modules.extend(name for name in names if name.split(".")[0] in own and name not in modules)
+    return modules
+
+
+def import_times(modules):
+    # -X importtime skriver "import time: self [us] | cumulative | modul" till stderr.
+    code = (f"import sys; import {', '.join(modules)}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    loaded = [name for name in completed.stdout.strip().split(",") if name]
+    return rows, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importtid vid kallstart av appens moduler.")
+    parser.add_argument("--topp", type=int, default=15, help="antal paket att visa (standard: %(default)s)")
+    parser.add_argument("--utan-streamlit", action="store_true", help="mät bara projektets egna moduler")
+    parser.add_argument("--max-sekunder", type=float, default=None,
+                        help="avsluta med felkod om projektets moduler tar längre tid än så")
+    args = parser.parse_args(argv)
+
+    own_modules = app_modules()
+    modules = own_modules if args.utan_streamlit else ["streamlit"] + own_modules
+    rows, loaded = import_times(modules)
+
+    per_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        per_package[name.split(".")[0]] += self_us
+    total_us = sum(per_package.values())
+    # Även projektmoduler som bara laddas indirekt (t.ex. parallel) räknas.
+    own = project_modules()
+    app_us = sum(self_us for name, self_us in per_package.items() if name in own)
+
+    print(f"Total importtid: {total_us / 1e6:.3f} s (projektets moduler: {app_us / 1e6:.3f} s)")
+    print()
+    print(f"{'paket':<24} {'sekunder':>10}")
+    for name, self_us in sorted(per_package.items(), key=lambda item: -item[1])[:args.topp]:
+        print(f"{name:<24} {self_us / 1e6:10.3f}")
+    print()
+    print(f"Tunga bibliotek laddade vid start: {', '.join(loaded) if loaded else 'inga'}")
+
+    if args.max_sekunder is not None and app_us / 1e6 > args.max_sekunder:
+        return 1
+    return 1 if loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
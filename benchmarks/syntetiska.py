@@ -0,0 +1,95 @@
+import os
+import random
+
+from fpdf import FPDF
+
+ROWS_PER_PAGE = 40
+LINE_HEIGHT = 6
+
+
+def _write_pdf(pages, path):
+    pdf = FPDF()
+    pdf.set_auto_page_break(False)
+    pdf.set_font("Arial", size=9)
+    for lines in pages:
+        pdf.add_page()
+        for line in lines:
+            pdf.cell(0, LINE_HEIGHT, line, ln=True)
+    pdf.output(path)
+    return path
+
+
+def _order_numbers(rng, count):
+    return [str(number) for number in rng.sample(range(1000000, 9999999), count)]
+
+
+def confirmation_pages(page_count, seed=0):
+    # Leveransbekräftelse: orderrader med sjusiffrig order i fjärde kolumnen och
+    # antal sist, samt Reorder-rader med antalet på en egen rad.
+    rng = random.Random(seed)
+    orders = _order_numbers(rng, page_count * ROWS_PER_PAGE)
+    quantities = {}
+    pages = []
+    for page in range(page_count):
+        lines = [f"Orderbekräftelse Pressglass sida {page + 1}"]
+        for order in orders[page * ROWS_PER_PAGE:(page + 1) * ROWS_PER_PAGE][:ROWS_PER_PAGE // 2]:
+            qty = rng.randint(1, 40)
+            quantities[order] = qty
+            if rng.random() < 0.15:
+                lines += [f"Reorder {order}", str(qty)]
+            else:
+                lines.append(f"{len(quantities)} Okno PVC {order} {rng.randint(500, 2400)}x{rng.randint(500, 2400)} {qty}")
+        pages.append(lines)
+    return pages, quantities
+
+
+def invoice_pages(quantities, page_count, seed=0, mismatch_rate=0.05):
+    rng = random.Random(seed + 1)
+    orders = list(quantities)
+    per_page = max(1, -(-len(orders) // page_count))
+    pages = []
+    for page in range(page_count):
+        lines = [f"Fakturanr: PG-{seed:04d}-{page_count}"] if page == 0 else []
+        for order in orders[page * per_page:(page + 1) * per_page]:
+            qty = quantities[order] + (1 if rng.random() < mismatch_rate else 0)
+            lines += [f"Zamówienie / Order: {order}", "Okno PVC 1200x1400", f"P {qty},00 pcs"]
+        pages.append(lines)
+    return pages
+
+
+def order_pages(page_count, seed=0, deviation_rate=0.03):
+    # Order med "Rad N"-block och attributrader för färg, spröjs, glas och handtag.
+    rng = random.Random(seed + 2)
+    values = {
+        "Färg": ("Färg vit", ["Färg svart", "Färg röd"]),
+        "Spröjs": ("Spröjs nej", ["Spröjs 2x2"]),
+        "Glas": ("Glas 3-glas klart", ["Glas 2-glas frostat"]),
+        "Handtag": ("Handtag vit", ["Handtag krom"]),
+    }
+    pages = []
+    row = 1
+    for _ in range(page_count):
+        lines = []
+        while len(lines) + 7 <= ROWS_PER_PAGE:
+            lines += [f"Rad {row}", f"AF {rng.randint(100, 999)} {rng.randint(500, 2400)}x{rng.randint(500, 2400)}"]
+            for common, deviations in values.values():
+                lines.append(rng.choice(deviations) if rng.random() < deviation_rate else common)
+            lines.append(f"Antal {rng.randint(1, 4)}")
+            row += 1
+        pages.append(lines)
+    return pages
+
+
+def generate(directory, page_count, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        name: os.path.join(directory, f"{name}-{page_count}.pdf")
+        for name in ("bekraftelse", "faktura", "order")
+    }
+    if all(os.path.exists(path) for path in paths.values()):
+        return paths
+    confirmation, quantities = confirmation_pages(page_count, seed)
+    _write_pdf(confirmation, paths["bekraftelse"])
+    _write_pdf(invoice_pages(quantities, page_count, seed), paths["faktura"])
+    _write_pdf(order_pages(page_count, seed), paths["order"])
+    return paths
@@ -0,0 +1,238 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from orderanalys import ALL_PRODUCTS, attribute_of, product_of
+
+STORE_FILENAME = "granskningar.sqlite"
+OK = "OK"
+REJECTED = "EJ OK"
+PENDING_STATUS = "Ej granskad"
+STATUSES = [OK, REJECTED, PENDING_STATUS]
+# Så många utfall behövs innan baslinjen uttalar sig om en rad.
+MIN_OBSERVATIONS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS granskningar (
+    id INTEGER PRIMARY KEY,
+    ordernamn TEXT NOT NULL,
+    dokument_hash TEXT,
+    granskare TEXT,
+    granskad TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS beslut (
+    id INTEGER PRIMARY KEY,
+    granskning_id INTEGER NOT NULL REFERENCES granskningar (id),
+    rubrik TEXT NOT NULL,
+    attribut TEXT,
+    avvikelse TEXT NOT NULL,
+    forvantat TEXT,
+    status TEXT NOT NULL,
+    granskad TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS beslut_status ON beslut (status, granskad);
+CREATE INDEX IF NOT EXISTS beslut_attribut ON beslut (attribut, status, granskad);
+CREATE INDEX IF NOT EXISTS beslut_granskad ON beslut (granskad);
+CREATE INDEX IF NOT EXISTS granskningar_order ON granskningar (ordernamn);
+CREATE TABLE IF NOT EXISTS baslinje (
+    produkt TEXT NOT NULL,
+    attribut TEXT NOT NULL,
+    rad TEXT NOT NULL,
+    ok INTEGER NOT NULL DEFAULT 0,
+    ej_ok INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (produkt, attribut, rad)
+);
+"""
+
+# Format från de gamla _granskning.txt-filerna.
+_TEXT_LINE = re.compile(r"^(?P<rubrik>.*) – (?P<avvikelse>.*) – Förväntat: (?P<forvantat>.*) – Status: (?P<status>.*)$")
+
+
+def baseline_rows(decisions):
+    # Utfall per (produkt, attribut, rad). OK betyder att raden dög trots att
+    # den avvek; EJ OK att den var fel och att det förväntade värdet gällde.
+    for header, attribute, deviation, expected, status in decisions:
+        if status not in (OK, REJECTED) or attribute is None:
+            continue
+        for product in {product_of(header), ALL_PRODUCTS}:
+            if status == OK:
+                yield product, attribute, deviation, 1, 0
+            else:
+                yield product, attribute, deviation, 0, 1
+                if expected:
+                    yield product, attribute, expected, 1, 0
+
+
+class AttributeBaseline:
+    # Inlärda utfall i minnet: (produkt, attribut) -> {rad: [ok, ej_ok]}.
+    # Byggs en gång från baslinjetabellen och räknas upp för varje granskning;
+    # varje uppslag är en ordboksuppslagning.
+    def __init__(self):
+        self.counts = {}
+        # (produkt, attribut) -> (antal ok, rad) för den oftast godkända raden.
+        self.best = {}
+
+    def add(self, product, attribute, line, ok, rejected):
+        key = (product, attribute)
+        tally = self.counts.setdefault(key, {}).setdefault(line, [0, 0])
+        tally[0] += ok
+        tally[1] += rejected
+        if tally[0] > self.best.get(key, (0, None))[0]:
+            self.best[key] = (tally[0], line)
+
+    def _tally(self, product, attribute, line):
+        # Produkttypens egna utfall om de räcker, annars alla produkters.
+        for key in ((product, attribute), (ALL_PRODUCTS, attribute)):
+            tally = self.counts.get(key, {}).get(line)
+            if tally and sum(tally) >= MIN_OBSERVATIONS:
+                return tally
+        return None
+
+    def rejected_share(self, product, attribute, line):
+        tally = self._tally(product, attribute, line)
+        return round(tally[1] / sum(tally), 2) if tally else None
+
+    def expected(self, product, attribute):
+        for key in ((product, attribute), (ALL_PRODUCTS, attribute)):
+            if key in self.best:
+                return self.best[key][1]
+        return None
+
+    def __len__(self):
+        return sum(len(lines) for lines in self.counts.values())
+
+
+class ReviewStore:
+    # Granskningar sparas som rader som bara läggs till. En ny granskning av
+    # samma order blir en ny omgång; inget skrivs över.
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, STORE_FILENAME)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+        self.baseline = self._load_baseline()
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add_review(self, order_name, decisions, reviewer=None, digest=None, reviewed=None):
+        # decisions: (avvikelse från detect_pdf_anomalies, status)
+        reviewed = (reviewed or datetime.now()).isoformat(timespec="seconds")
+        rows = [(anomaly["Header"], anomaly.get("Attribut") or attribute_of(anomaly["Avvikelse"]),
+                 anomaly["Avvikelse"], anomaly["Förväntat"], status) for anomaly, status in decisions]
+        outcomes = list(baseline_rows(rows))
+        with self._lock, self._connect() as db:
+            review_id = db.execute(
+                "INSERT INTO granskningar (ordernamn, dokument_hash, granskare, granskad) VALUES (?, ?, ?, ?)",
+                (order_name, digest, reviewer, reviewed),
+            ).lastrowid
+            db.executemany(
+                "INSERT INTO beslut (granskning_id, rubrik, attribut, avvikelse, forvantat, status, granskad)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(review_id, *row, reviewed) for row in rows],
+            )
+            self._add_outcomes(db, outcomes)
+            for outcome in outcomes:
+                self.baseline.add(*outcome)
+        return review_id
+
+    @staticmethod
+    def _add_outcomes(db, outcomes):
+        db.executemany(
+            "INSERT INTO baslinje (produkt, attribut, rad, ok, ej_ok) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (produkt, attribut, rad) DO UPDATE SET ok = ok + excluded.ok, ej_ok = ej_ok + excluded.ej_ok",
+            outcomes,
+        )
+
+    def _load_baseline(self):
+        baseline = AttributeBaseline()
+        with self._lock, self._connect() as db:
+            # Granskningar sparade innan baslinjen fanns räknas in en gång.
+            if not db.execute("SELECT 1 FROM baslinje LIMIT 1").fetchone():
+                self._add_outcomes(db, list(baseline_rows(db.execute(
+                    "SELECT rubrik, attribut, avvikelse, forvantat, status FROM beslut WHERE status IN (?, ?)",
+                    (OK, REJECTED)))))
+            for row in db.execute("SELECT produkt, attribut, rad, ok, ej_ok FROM baslinje"):
+                baseline.add(*row)
+        return baseline
+
+    def import_text_files(self):
+        # Engångsinläsning av granskningar som sparades som textfiler.
+        with self._connect() as db:
+            if db.execute("SELECT 1 FROM granskningar LIMIT 1").fetchone():
+                return 0
+        count = 0
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith("_granskning.txt"):
+                continue
+            filepath = os.path.join(self.directory, filename)
+            decisions = []
+            with open(filepath, encoding="utf-8") as f:
+                for line in f:
+                    m = _TEXT_LINE.match(line.rstrip("\n"))
+                    if m:
+                        decisions.append(({"Header": m["rubrik"], "Avvikelse": m["avvikelse"],
+                                           "Förväntat": m["forvantat"]}, m["status"]))
+            if decisions:
+                self.add_review(filename[:-len("_granskning.txt")], decisions,
+                                reviewed=datetime.fromtimestamp(os.path.getmtime(filepath)))
+                count += 1
+        return count
+
+    @staticmethod
+    def _filter(statuses=None, attribute=None, text="", since=None, until=None, order="", reviewer=""):
+        clauses, params = [], []
+        if statuses:
+            clauses.append(f"b.status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if attribute:
+            clauses.append("b.attribut = ?")
+            params.append(attribute)
+        if since:
+            clauses.append("b.granskad >= ?")
+            params.append(since.isoformat())
+        if until:
+            # Hela slutdagen räknas med.
+            clauses.append("b.granskad < ?")
+            params.append(f"{until.isoformat()}T99")
+        if text:
+            clauses.append("(b.avvikelse LIKE ? OR b.rubrik LIKE ?)")
+            params.extend([f"%{text}%"] * 2)
+        if order:
+            clauses.append("g.ordernamn LIKE ?")
+            params.append(f"%{order}%")
+        if reviewer:
+            clauses.append("g.granskare LIKE ?")
+            params.append(f"%{reviewer}%")
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, **filters):
+        where, params = self._filter(**filters)
+        with self._connect() as db:
+            return db.execute(
+                f"SELECT COUNT(*) FROM beslut b JOIN granskningar g ON g.id = b.granskning_id {where}", params
+            ).fetchone()[0]
+
+    def search(self, limit=50, offset=0, **filters):
+        where, params = self._filter(**filters)
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT b.granskad AS Granskad, g.ordernamn AS 'Order', b.rubrik AS Rad, b.attribut AS Attribut,"
+                " b.avvikelse AS Avvikelse, b.forvantat AS Förväntat, b.status AS Status, g.granskare AS Granskare"
+                f" FROM beslut b JOIN granskningar g ON g.id = b.granskning_id {where}"
+                " ORDER BY b.granskad DESC, b.id LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows]
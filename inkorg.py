@@ -0,0 +1,348 @@
+import argparse
+import os
+import shutil
+import sys
+import time
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from granskningar import PENDING_STATUS, ReviewStore
+from orderanalys import BLOCK_START, analyse_order_document, find_anomalies
+from orderindex import INDEX_PATH, ORDER, OrderIndex
+from orderliggare import CONFIRMATION, INVOICE, LEDGER_PATH, OrderLedger
+from parallel import process_pool, read_pdf_bytes, resolve_workers
+from parse_cache import ParseCache, content_hash
+from pdfkalla import open_pdf
+from pressglass import (compare_orders, extract_confirmation_postings, extract_invoice_postings,
+                        iter_confirmation_orders, sum_postings)
+from rapport import generate_pdf_report
+from rapportindex import ReportIndex
+from resultatlager import save_result
+from suppliers import DEFAULT_SUPPLIER, SUPPLIERS, layout
+
+# Underkataloger i inkorgen. Väntande dokument saknar ännu sin motpart.
+WAITING_DIR = "vantar"
+DONE_DIR = "behandlade"
+UNKNOWN_DIR = "okanda"
+# Så många sidor läses för att avgöra dokumenttypen.
+CLASSIFY_PAGES = 3
+# Andel av det mindre dokumentets ordrar som måste finnas i det andra för att para dem.
+MIN_OVERLAP = 0.5
+
+
+def classify(lines, supplier=DEFAULT_SUPPLIER):
+    text = " ".join(lines)
+    if layout(supplier, "fakturahuvud").match(text) is not None:
+        return INVOICE
+    if any(event == "order" for event, _ in layout(supplier, "faktura").scan(text)):
+        return INVOICE
+    if any(BLOCK_START.match(line) for line in lines):
+        return ORDER
+    if next(iter_confirmation_orders(lines, supplier), None) is not None:
+        return CONFIRMATION
+    return None
+
+
+def analyse_document(path, supplier=DEFAULT_SUPPLIER):
+    # Körs i arbetsprocesserna: avgör typen och tolkar dokumentet en gång.
+    # Dokumentet som öppnades för klassningen lånas ut till parsern när den
+    # använder samma backend.
+    with open_pdf(path) as doc:
+        kind = classify(list(doc.iter_lines(range(min(len(doc), CLASSIFY_PAGES)))), supplier)
+        if kind == CONFIRMATION:
+            result = extract_confirmation_postings(doc, supplier)
+        elif kind == INVOICE:
+            result = extract_invoice_postings(doc, workers=1, supplier=supplier)
+        elif kind == ORDER:
+            result = analyse_order_document(doc)
+        else:
+            result = None
+        return content_hash(doc.getvalue()), kind, result
+
+
+def cache_kind(kind, supplier):
+    # Samma cachenycklar som appen använder.
+    return "orderdokument" if kind == ORDER else f"{kind}-{supplier}"
+
+
+def overlap(orders, other):
+    if not orders or not other:
+        return 0.0
+    return len(orders.keys() & other.keys()) / min(len(orders), len(other))
+
+
+def log(message):
+    print(f"{datetime.now().isoformat(timespec='seconds')}  {message}", flush=True)
+
+
+def _move(path, directory):
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(path))
+    if os.path.exists(target):
+        stem, ext = os.path.splitext(target)
+        target = f"{stem}-{datetime.now().strftime('%Y%m%d%H%M%S')}{ext}"
+    shutil.move(path, target)
+    return target
+
+
+class Inbox:
+    def __init__(self, directory, history_dir="rapporthistorik", reviewed_dir="granskade_ordrar",
+                 ledger_path=LEDGER_PATH, index_path=INDEX_PATH, supplier=DEFAULT_SUPPLIER, workers=None,
+                 cache=None):
+        self.directory = directory
+        self.history_dir = history_dir
+        self.supplier = supplier
+        self.workers = resolve_workers(workers)
+        self.cache = cache or ParseCache()
+        self.index = ReportIndex(history_dir)
+        self.ledger = OrderLedger(ledger_path)
+        self.order_index = OrderIndex(index_path)
+        self.reviews = ReviewStore(reviewed_dir)
+        # typ -> {sökväg i vantar/: (hash, ordrar, namn)}
+        self.waiting = {CONFIRMATION: {}, INVOICE: {}}
+        self._sizes = {}
+        self._pool = None
+        os.makedirs(directory, exist_ok=True)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _ready_files(self, settle):
+        # En fil räknas som färdigkopierad när storlek och ändringstid stått still ett varv.
+        ready = []
+        sizes = {}
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not name.lower().endswith(".pdf") or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Flyttad eller borttagen sedan katalogen listades.
+                continue
+            sizes[path] = (stat.st_size, stat.st_mtime)
+            if not settle or self._sizes.get(path) == sizes[path]:
+                ready.append(path)
+        self._sizes = {path: size for path, size in sizes.items() if path not in ready}
+        return ready
+
+    def _analyse(self, paths):
+        # Resultat som redan finns i tolkningscachen (t.ex. från appen) tolkas inte om.
+        results = {}
+        pending = []
+        for path in paths:
+            try:
+                digest = content_hash(read_pdf_bytes(path))
+            except OSError as exc:
+                results[path] = exc
+                continue
+            kind = self.cache.get("klassning", digest)
+            value = self.cache.get(cache_kind(kind, self.supplier), digest) if kind else None
+            if value is not None:
+                results[path] = (digest, kind, value)
+            else:
+                pending.append(path)
+        if self.workers > 1 and len(pending) > 1:
+            outcomes = self._analyse_in_pool(pending)
+        else:
+            outcomes = {}
+            for path in pending:
+                try:
+                    outcomes[path] = analyse_document(path, self.supplier)
+                except Exception as exc:
+                    outcomes[path] = exc
+        for path, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                results[path] = outcome
+                continue
+            digest, kind, value = outcome
+            if kind is not None:
+                self.cache.put("klassning", digest, kind)
+                self.cache.put(cache_kind(kind, self.supplier), digest, value)
+            results[path] = outcome
+        return results
+
+    def _reset_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _submit(self, path):
+        if self._pool is None:
+            self._pool = process_pool(self.workers)
+        return self._pool.submit(analyse_document, path, self.supplier)
+
+    def _analyse_in_pool(self, paths):
+        # En arbetsprocess som dör (t.ex. när minnet tar slut) gör hela poolen
+        # obrukbar. Den byts då ut och de filer som inte blev klara tolkas om
+        # en i taget, så att bara en fil som fäller poolen igen räknas som fel.
+        outcomes = {}
+        broken = []
+        futures = {}
+        for path in paths:
+            try:
+                futures[path] = self._submit(path)
+            except BrokenProcessPool:
+                broken.append(path)
+        for path, future in futures.items():
+            try:
+                outcomes[path] = future.result()
+            except BrokenProcessPool:
+                broken.append(path)
+            except Exception as exc:
+                outcomes[path] = exc
+        if broken:
+            log(f"FEL   processpoolen slutade fungera, tolkar om {len(broken)} filer")
+            self._reset_pool()
+        for path in broken:
+            try:
+                outcomes[path] = self._submit(path).result()
+            except BrokenProcessPool as exc:
+                self._reset_pool()
+                outcomes[path] = exc
+            except Exception as exc:
+                outcomes[path] = exc
+        return outcomes
+
+    def restore(self):
+        # Efter omstart läses väntande dokument in igen (oftast direkt ur cachen).
+        waiting_dir = os.path.join(self.directory, WAITING_DIR)
+        if not os.path.isdir(waiting_dir):
+            return
+        paths = [os.path.join(waiting_dir, name) for name in sorted(os.listdir(waiting_dir))
+                 if name.lower().endswith(".pdf")]
+        for path, outcome in self._analyse(paths).items():
+            if isinstance(outcome, Exception) or outcome[1] not in self.waiting:
+                self._reject(path)
+                continue
+            digest, kind, value = outcome
+            self.waiting[kind][path] = (digest,) + self._orders(path, kind, value)
+
+    def poll(self, settle=True):
+        # Varje fil hanteras för sig: ett fel i tolkning, liggare, index eller
+        # rapport flyttar bara den filen till okanda/ och tjänsten fortsätter.
+        for path, outcome in self._analyse(self._ready_files(settle)).items():
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                digest, kind, value = outcome
+                if kind is None:
+                    log(f"OKÄND {os.path.basename(path)}")
+                    _move(path, os.path.join(self.directory, UNKNOWN_DIR))
+                elif kind == ORDER:
+                    self._write_review(path, digest, value)
+                else:
+                    self._add(path, digest, kind, value)
+            except Exception as exc:
+                log(f"FEL   {os.path.basename(path)}: {type(exc).__name__}: {exc}")
+                self._reject(path)
+
+    def _reject(self, path):
+        if not os.path.exists(path):
+            return
+        try:
+            _move(path, os.path.join(self.directory, UNKNOWN_DIR))
+        except OSError as exc:
+            log(f"FEL   kunde inte flytta {os.path.basename(path)}: {exc}")
+
+    def _write_review(self, path, digest, analysis):
+        # Avvikelserna hamnar bland de granskade ordrarna och väntar på en människa.
+        anomalies = find_anomalies(analysis["attribut"], self.reviews.baseline)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        references = [(order, page, None) for order, page in analysis["referenser"]]
+        self.order_index.add_document(ORDER, digest, stem, references, os.path.basename(path))
+        if anomalies:
+            self.reviews.add_review(stem, [(anomaly, PENDING_STATUS) for anomaly in anomalies],
+                                    reviewer="inkorg", digest=digest)
+        _move(path, os.path.join(self.directory, DONE_DIR))
+        log(f"ORDER {os.path.basename(path)}: {len(anomalies)} avvikelser att granska")
+
+    @staticmethod
+    def _orders(path, kind, value):
+        postings, name = (value, None) if kind == CONFIRMATION else value
+        return sum_postings(postings), name or os.path.splitext(os.path.basename(path))[0]
+
+    def _add(self, path, digest, kind, value):
+        orders, name = self._orders(path, kind, value)
+        self.ledger.add_document(kind, digest, name, orders, self.supplier)
+        self.order_index.add_document(kind, digest, name, value if kind == CONFIRMATION else value[0],
+                                      os.path.basename(path))
+
+        other_kind = INVOICE if kind == CONFIRMATION else CONFIRMATION
+        best_path, best_overlap = None, MIN_OVERLAP
+        for other_path, (_, other_orders, _) in self.waiting[other_kind].items():
+            score = overlap(orders, other_orders)
+            if score >= best_overlap:
+                best_path, best_overlap = other_path, score
+        if best_path is None:
+            waiting_path = _move(path, os.path.join(self.directory, WAITING_DIR))
+            self.waiting[kind][waiting_path] = (digest, orders, name)
+            log(f"VÄNTA {os.path.basename(path)}: {kind} med {len(orders)} ordrar saknar motpart")
+            return
+
+        # Motparten släpps ur väntelistan först när jämförelsen gått igenom, så
+        # att den väntar kvar om något går fel.
+        _, other_orders, other_name = self.waiting[other_kind][best_path]
+        if kind == CONFIRMATION:
+            conf_path, confirmation, invoice, faktura_id = path, orders, other_orders, other_name
+        else:
+            conf_path, confirmation, invoice, faktura_id = best_path, other_orders, orders, name
+        self._reconcile(conf_path, confirmation, invoice, faktura_id)
+        del self.waiting[other_kind][best_path]
+        for done_path in (path, best_path):
+            _move(done_path, os.path.join(self.directory, DONE_DIR))
+
+    def _reconcile(self, conf_path, confirmation, invoice, faktura_id):
+        leverans_id = os.path.splitext(os.path.basename(conf_path))[0]
+        df = compare_orders(confirmation, invoice)
+        mismatches = int((df["Matchar?"] == "NEJ").sum())
+        os.makedirs(self.history_dir, exist_ok=True)
+        saved_path = generate_pdf_report(df, faktura_id, leverans_id, self.history_dir)
+        self.index.add(faktura_id, leverans_id, saved_path, ordrar=len(df), avvikelser=mismatches)
+        save_result(df, saved_path, faktura_id, leverans_id)
+        log(f"{'OK ' if mismatches == 0 else 'NEJ'}   {faktura_id}-{leverans_id}: {len(df)} ordrar,"
+            f" {mismatches} avvikelser")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Bevakar en inkorg och jämför inkomna leveransbekräftelser och fakturor automatiskt."
+    )
+    parser.add_argument("inkorg", help="katalog där PDF:er läggs")
+    parser.add_argument("--intervall", type=float, default=10, help="sekunder mellan genomsökningar (standard: %(default)s)")
+    parser.add_argument("--en-gang", action="store_true", help="behandla det som ligger i inkorgen och avsluta")
+    parser.add_argument("--historik", default="rapporthistorik", help="katalog för rapporter (standard: %(default)s)")
+    parser.add_argument("--granskade", default="granskade_ordrar",
+                        help="katalog för avvikelser att granska (standard: %(default)s)")
+    parser.add_argument("--liggare", default=LEDGER_PATH, help="orderliggarens databas (standard: %(default)s)")
+    parser.add_argument("--orderindex", default=INDEX_PATH, help="orderindexets databas (standard: %(default)s)")
+    parser.add_argument("--leverantor", choices=sorted(SUPPLIERS), default=DEFAULT_SUPPLIER,
+                        help="leverantörsformat för tolkningen (standard: %(default)s)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="antal processer, 0 = en per kärna (standard: $ORDERKONTROLL_WORKERS eller 1)")
+    args = parser.parse_args(argv)
+
+    inbox = Inbox(args.inkorg, args.historik, args.granskade, args.liggare, args.orderindex, args.leverantor,
+                  args.workers)
+    inbox.restore()
+    log(f"Bevakar {args.inkorg} ({inbox.workers} processer)")
+    try:
+        while True:
+            inbox.poll(settle=not args.en_gang)
+            if args.en_gang:
+                break
+            time.sleep(args.intervall)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        inbox.close()
+    waiting = sum(len(documents) for documents in inbox.waiting.values())
+    if waiting:
+        log(f"{waiting} dokument väntar på motpart i {os.path.join(args.inkorg, WAITING_DIR)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
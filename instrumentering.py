@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from pdfkalla import open_pdf
+
+PERF_LOG = "prestandalogg.jsonl"
+PROFILE_DIR = "profiler"
+# "cprofile", "tracemalloc" eller "båda" slår på profilering av varje körning.
+PROFILE_ENV = "ORDERKONTROLL_PROFIL"
+
+_log_lock = threading.Lock()
+
+
+def append_log(record, path=PERF_LOG):
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class RunTimer:
+    def __init__(self, view):
+        self.view = view
+        self.started = datetime.now()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, pages=None, nbytes=None):
+        record = {"steg": name, "sekunder": None, "sidor": pages, "byte": nbytes, "cache": None}
+        self.stages.append(record)
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["sekunder"] = round(time.perf_counter() - started, 4)
+
+    def parse(self, name, cache, kind, data, backend, parse, pages=None):
+        # Dokumentet öppnas bara vid en cachemiss, en gång, och lånas ut till
+        # parsern. pages anropas då med sidantalet, t.ex. för ett jobbs förlopp.
+        with self.stage(name, nbytes=len(data)) as record:
+            record["cache"] = "träff"
+
+            def timed_parse(_):
+                record["cache"] = "miss"
+                with open_pdf(data, backend) as doc:
+                    record["sidor"] = len(doc)
+                    if pages is not None:
+                        pages(len(doc))
+                    return parse(doc)
+
+            return cache.get_or_parse(kind, data, timed_parse)
+
+    def cached(self, name, cache, kind, digest, compute):
+        with self.stage(name) as record:
+            record["cache"] = "träff"
+
+            def timed_compute():
+                record["cache"] = "miss"
+                return compute()
+
+            return cache.get_or_compute(kind, digest, timed_compute)
+
+    def total(self):
+        return round(sum(record["sekunder"] or 0 for record in self.stages), 4)
+
+    def log(self, path=PERF_LOG):
+        append_log({
+            "tid": self.started.isoformat(timespec="seconds"),
+            "vy": self.view,
+            "totalt": self.total(),
+            "steg": self.stages,
+        }, path)
+
+
+@contextmanager
+def profiled(view, mode=None, directory=PROFILE_DIR):
+    mode = (mode if mode is not None else os.environ.get(PROFILE_ENV, "")).lower()
+    use_cprofile = mode in ("cprofile", "båda")
+    use_tracemalloc = mode in ("tracemalloc", "båda")
+    if not (use_cprofile or use_tracemalloc):
+        yield None
+        return
+
+    import cProfile
+    import tracemalloc
+
+    stem = os.path.join(directory, f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{view}")
+    os.makedirs(directory, exist_ok=True)
+    profiler = cProfile.Profile() if use_cprofile else None
+    started_tracing = use_tracemalloc and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(25)
+    if profiler:
+        profiler.enable()
+    try:
+        yield stem
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(f"{stem}.prof")
+        if use_tracemalloc and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            with open(f"{stem}-minne.txt", "w", encoding="utf-8") as f:
+                f.write(f"Nuvarande: {current / 1024:.0f} KiB, topp: {peak / 1024:.0f} KiB\n\n")
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+            if started_tracing:
+                tracemalloc.stop()
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Antal jobb som körs samtidigt på servern, delat mellan alla användare.
+JOB_WORKERS_ENV = "ORDERKONTROLL_JOBB"
+DEFAULT_JOB_WORKERS = 2
+
+QUEUED = "i kö"
+RUNNING = "pågår"
+DONE = "klar"
+FAILED = "fel"
+
+
+class Job:
+    def __init__(self, kind, label, key=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.label = label
+        self.key = key
+        self.status = QUEUED
+        self.pages = 0
+        self.pages_done = 0
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.created = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def add_pages(self, pages):
+        with self._lock:
+            self.pages += pages or 0
+
+    def advance(self, pages=1):
+        with self._lock:
+            self.pages_done += pages
+
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        if not self.pages:
+            return 0.0
+        return min(self.pages_done / self.pages, 1.0)
+
+    def describe(self):
+        if self.status == QUEUED:
+            return f"{self.label}: väntar på ledig plats"
+        if self.pages:
+            return f"{self.label}: {min(self.pages_done, self.pages)} av {self.pages} sidor"
+        return f"{self.label}: {self.status}"
+
+
+class JobQueue:
+    def __init__(self, workers=None, max_finished=100):
+        if workers is None:
+            try:
+                workers = int(os.environ.get(JOB_WORKERS_ENV, DEFAULT_JOB_WORKERS))
+            except ValueError:
+                workers = DEFAULT_JOB_WORKERS
+        # Trådar räcker: tolkningen delar cacharna i processen och kan själv
+        # sprida stora fakturor på processer (ORDERKONTROLL_WORKERS).
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="jobb")
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, label, function, *args, key=None, retry=False, **kwargs):
+        # Samma nyckel (t.ex. filernas innehåll) ger samma jobb och resultat,
+        # så en omkörning av sidan startar inget nytt arbete. Även ett
+        # misslyckat jobb lämnas tillbaka; det körs om bara med retry=True,
+        # när användaren uttryckligen ber om det.
+        with self._lock:
+            if key is not None:
+                existing = self._jobs.get(self._by_key.get(key))
+                if existing is not None and not (retry and existing.status == FAILED):
+                    return existing
+            job = Job(kind, label, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+        self._executor.submit(self._run, job, function, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _run(self, job, function, args, kwargs):
+        job.status = RUNNING
+        try:
+            job.result = function(job, *args, **kwargs)
+            job.status = DONE
+        except Exception as exc:
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.traceback = traceback.format_exc()
+            job.status = FAILED
+        job.finished_at = time.time()
+        self._forget_old()
+
+    def _forget_old(self):
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.finished]
+            for job in finished[:max(len(finished) - self.max_finished, 0)]:
+                del self._jobs[job.id]
+                if self._by_key.get(job.key) == job.id:
+                    del self._by_key[job.key]
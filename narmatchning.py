@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+# Siffror som OCR och slarviga inskrivningar ofta förväxlar.
+CONFUSABLE_DIGITS = {frozenset(pair) for pair in ("17", "38", "08", "56", "68", "49", "14", "35", "69")}
+SUBSTITUTION = "utbytt siffra"
+TRANSPOSITION = "omkastade siffror"
+BASE_CONFIDENCE = {SUBSTITUTION: 0.6, TRANSPOSITION: 0.7}
+CONFUSABLE_BONUS = 0.15
+SAME_QUANTITY_BONUS = 0.25
+# Avdrag per ytterligare kandidat som en order kunde ha parats med.
+AMBIGUITY_PENALTY = 0.1
+MIN_CONFIDENCE = 0.5
+
+
+def block_keys(order):
+    # Nycklar där en siffra, eller två intilliggande, är maskade. Två nummer som
+    # skiljer sig på en plats eller i ett omkastat par delar minst en nyckel,
+    # så bara de behöver jämföras i stället för alla par.
+    for i in range(len(order)):
+        yield order[:i] + "_" + order[i + 1:]
+    for i in range(len(order) - 1):
+        yield order[:i] + "__" + order[i + 2:]
+
+
+def difference(a, b):
+    if len(a) != len(b):
+        return None
+    positions = [i for i, (x, y) in enumerate(zip(a, b)) if x != y]
+    if len(positions) == 1:
+        return SUBSTITUTION, positions
+    if len(positions) == 2 and positions[1] == positions[0] + 1 and a[positions[0]] == b[positions[1]] \
+            and a[positions[1]] == b[positions[0]]:
+        return TRANSPOSITION, positions
+    return None
+
+
+def confidence(a, b, kind, positions, qty_a=None, qty_b=None):
+    score = BASE_CONFIDENCE[kind]
+    if kind == SUBSTITUTION and frozenset((a[positions[0]], b[positions[0]])) in CONFUSABLE_DIGITS:
+        score += CONFUSABLE_BONUS
+    if qty_a is not None and qty_a == qty_b:
+        score += SAME_QUANTITY_BONUS
+    return round(min(score, 0.99), 2)
+
+
+def suggest_pairings(confirmation_only, invoice_only, min_confidence=MIN_CONFIDENCE):
+    # confirmation_only/invoice_only: {ordernummer: antal} för rader utan exakt motpart.
+    # Varje order paras med högst en annan, starkaste förslaget först.
+    blocks = defaultdict(list)
+    for order in invoice_only:
+        for key in block_keys(order):
+            blocks[key].append(order)
+
+    candidates = []
+    for order, qty in confirmation_only.items():
+        seen = set()
+        for key in block_keys(order):
+            for other in blocks.get(key, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                found = difference(order, other)
+                if found is None:
+                    continue
+                kind, positions = found
+                candidates.append((confidence(order, other, kind, positions, qty, invoice_only[other]),
+                                   order, other, kind, positions))
+
+    # Ett nummer med flera tänkbara motparter är ett osäkrare förslag.
+    alternatives = defaultdict(int)
+    for _, order, other, _, _ in candidates:
+        alternatives[("b", order)] += 1
+        alternatives[("f", other)] += 1
+    candidates = [
+        (round(score - AMBIGUITY_PENALTY * (alternatives[("b", order)] + alternatives[("f", other)] - 2), 2),
+         order, other, kind, positions)
+        for score, order, other, kind, positions in candidates
+    ]
+    candidates = [candidate for candidate in candidates if candidate[0] >= min_confidence]
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1], candidate[2]))
+    used_confirmation, used_invoice = set(), set()
+    suggestions = []
+    for score, order, other, kind, positions in candidates:
+        if order in used_confirmation or other in used_invoice:
+            continue
+        used_confirmation.add(order)
+        used_invoice.add(other)
+        suggestions.append({
+            "Ordernummer (Leveransbekräftelse)": order,
+            "Ordernummer (Faktura)": other,
+            "Antal (Leveransbekräftelse)": confirmation_only[order],
+            "Antal (Faktura)": invoice_only[other],
+            "Skillnad": f"{kind}, position {', '.join(str(p + 1) for p in positions)}",
+            "Säkerhet": score,
+        })
+    return suggestions
+
+
+def unmatched_orders(df):
+    # Rader från compare_orders som bara finns i det ena dokumentet.
+    confirmation = df[df["Endast i leveransbekräftelse"]]
+    invoice = df[df["Endast i faktura"]]
+    return (dict(zip(confirmation["Ordernummer"], confirmation["Antal (Leveransbekräftelse)"].tolist())),
+            dict(zip(invoice["Ordernummer"], invoice["Antal (Faktura)"].tolist())))
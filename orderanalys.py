@@ -0,0 +1,172 @@
+import re
+from collections import Counter
+
+from parallel import map_page_chunks, read_pdf_bytes
+from pdfkalla import open_pdf
+
+
+# Blocken och attributraderna läses i läsordning, som förut med pdfplumber.
+ORDER_BACKEND = "pdfplumber"
+
+
+def _text_lines(source, page_numbers):
+    with open_pdf(source, ORDER_BACKEND) as doc:
+        return [doc.page_lines(n) for n in page_numbers]
+
+
+def extract_text_blocks_from_pdf(pdf_file, workers=None):
+    data = read_pdf_bytes(pdf_file)
+    with open_pdf(data, ORDER_BACKEND) as doc:
+        pages = map_page_chunks(_text_lines, data, len(doc), workers, local=doc)
+    lines = []
+    for page_lines in pages:
+        lines.extend(page_lines)
+    return lines
+
+
+def iter_text_lines(pdf_file, progress=None):
+    with open_pdf(pdf_file, ORDER_BACKEND) as doc:
+        yield from doc.iter_lines(progress=progress)
+
+
+BLOCK_START = re.compile(r"Rad\s*\d+")
+# Sjusiffriga ordernummer som nämns i en order, för orderindexet.
+ORDER_REFERENCE = re.compile(r"(?<!\d)(\d{7})(?!\d)")
+
+# Attribut som kontrolleras mot majoriteten i ordern: namn -> nyckelord i raden (gemener).
+# En rad som börjar med attributets namn ("Handtag vit") hör till det attributet;
+# nyckelorden avgör bara rader utan ett sådant namn.
+ATTRIBUTES = {
+    "Färg": ["vit", "röd", "svart"],
+    "Spröjs": ["spröjs"],
+    "Glas": ["glas"],
+    "Handtag": ["handtag"],
+}
+
+
+def compile_attributes(attributes):
+    # Ett uttryck som ger högst en träff per rad: namnet i radens början går
+    # före, annars det första nyckelordet från vänster.
+    names = {}
+    labels, keywords = [], []
+    for i, name in enumerate(attributes):
+        names[f"n{i}"] = names[f"a{i}"] = name
+        labels.append(f"(?P<n{i}>{re.escape(name.lower())})")
+        keywords.append(f"(?P<a{i}>{'|'.join(map(re.escape, attributes[name]))})")
+    pattern = rf"^\s*(?:{'|'.join(labels)})(?!\w)|{'|'.join(keywords)}"
+    return re.compile(pattern), names
+
+
+def attribute_of(line, attributes=None):
+    attribute_regex, names = _DEFAULT_ATTRIBUTES if attributes is None else compile_attributes(attributes)
+    m = attribute_regex.search(line.lower())
+    return names[m.lastgroup] if m else None
+
+
+_DEFAULT_ATTRIBUTES = compile_attributes(ATTRIBUTES)
+# Andel EJ OK i baslinjen som flaggar en rad även när den följer ordern. En
+# avvikande rad med högst 1 - FLAG_SHARE har oftast godkänts och flaggas inte.
+FLAG_SHARE = 0.5
+
+
+def iter_blocks(text_lines):
+    block = []
+    for line in text_lines:
+        if BLOCK_START.match(line):
+            if block:
+                yield block
+            block = [line]
+        else:
+            block.append(line)
+    if block:
+        yield block
+
+
+# Produkttypen i radens rubrik; inlärda baslinjer hålls per typ.
+PRODUCT = re.compile(r"\b(AVF|AF)\b")
+ALL_PRODUCTS = ""
+
+
+def block_header(block):
+    return f"{block[0]} - {next((l for l in block if 'AF' in l or 'AVF' in l), '')}"
+
+
+def product_of(header):
+    m = PRODUCT.search(header)
+    return m[1] if m else ALL_PRODUCTS
+
+
+def attribute_rows(text_lines, attributes=None):
+    attribute_regex, names = _DEFAULT_ATTRIBUTES if attributes is None else compile_attributes(attributes)
+    # Ett pass: varje rad gemenas en gång och matchas mot ett enda uttryck.
+    # Bara block med attributrader sparas; övriga släpps direkt när de passerat.
+    counts = {name: Counter() for name in names.values()}
+    blocks, rows = [], []
+    for block in iter_blocks(text_lines):
+        hits = []
+        for line in block:
+            m = attribute_regex.search(line.lower())
+            if m:
+                name = names[m.lastgroup]
+                counts[name][line] += 1
+                hits.append((len(blocks), name, line))
+        if hits:
+            blocks.append(block)
+            rows.extend(hits)
+
+    expected = {name: counter.most_common(1)[0][0] for name, counter in counts.items() if counter}
+    return {"block": blocks, "rader": rows, "förväntat": expected}
+
+
+def find_anomalies(attribute_data, baseline=None):
+    # Avvikelse mot majoriteten i ordern. Med en inlärd baslinje (se
+    # granskningar.py) får varje rad också sin historiska andel EJ OK: rader
+    # som brukar underkännas flaggas även när ordern själv inte avviker, och
+    # avvikande rader som brukar godkännas flaggas inte.
+    blocks, expected = attribute_data["block"], attribute_data["förväntat"]
+    headers = [block_header(block) for block in blocks]
+    anomaly_report = []
+    for block_no, name, line in attribute_data["rader"]:
+        header = headers[block_no]
+        product = product_of(header)
+        share = baseline.rejected_share(product, name, line) if baseline is not None else None
+        if line != expected[name]:
+            if share is not None and share <= 1 - FLAG_SHARE:
+                continue
+            wanted = expected[name]
+        elif share is not None and share >= FLAG_SHARE:
+            wanted = baseline.expected(product, name)
+            if wanted is None or wanted == line:
+                continue
+        else:
+            continue
+        anomaly_report.append({
+            "Header": header,
+            "Attribut": name,
+            "Detaljer": [l for l in blocks[block_no][1:] if l != line],
+            "Avvikelse": line,
+            "Förväntat": wanted,
+            "Andel EJ OK": share,
+        })
+    return anomaly_report
+
+
+def detect_pdf_anomalies(text_lines, attributes=None, baseline=None):
+    return find_anomalies(attribute_rows(text_lines, attributes), baseline)
+
+
+def analyse_order_document(pdf_file, attributes=None, progress=None):
+    # Ett pass över texten ger både attributraderna och de ordernummer (med
+    # sida) som nämns i dokumentet. Avvikelserna tas fram ur raderna med
+    # find_anomalies, så att resultatet kan cachas oberoende av baslinjen.
+    references = {}
+
+    def scanned(numbered_lines):
+        for number, line in numbered_lines:
+            for m in ORDER_REFERENCE.finditer(line):
+                references.setdefault((m[1], number + 1), None)
+            yield line
+
+    with open_pdf(pdf_file, ORDER_BACKEND) as doc:
+        rows = attribute_rows(scanned(doc.iter_page_lines(progress=progress)), attributes)
+    return {"attribut": rows, "referenser": list(references)}
@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from orderliggare import CONFIRMATION, INVOICE
+
+INDEX_PATH = "orderindex.sqlite"
+ORDER = "order"
+DOCUMENT_TYPES = {CONFIRMATION: "Leveransbekräftelse", INVOICE: "Faktura", ORDER: "Order"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dokument (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    typ TEXT NOT NULL,
+    namn TEXT NOT NULL,
+    fil TEXT,
+    registrerad TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS forekomster (
+    ordernummer TEXT NOT NULL,
+    dokument_id INTEGER NOT NULL REFERENCES dokument (id),
+    sida INTEGER,
+    antal INTEGER
+);
+CREATE INDEX IF NOT EXISTS forekomster_order ON forekomster (ordernummer);
+"""
+
+
+def _prefix_range(prefix):
+    # Prefixsökning som intervall så att indexet på ordernummer används.
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class OrderIndex:
+    # Inverterat index: ordernummer -> dokument, sida och antal. Varje dokument
+    # läggs till en gång (per innehållshash) när det tolkas.
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add_document(self, kind, digest, name, postings, filename=None):
+        # postings: (ordernummer, sida, antal); antal är None för ordrar som bara nämns.
+        if kind not in DOCUMENT_TYPES:
+            raise ValueError(f"Okänd dokumenttyp: {kind}")
+        with self._lock, self._connect() as db:
+            try:
+                document_id = db.execute(
+                    "INSERT INTO dokument (hash, typ, namn, fil, registrerad) VALUES (?, ?, ?, ?, ?)",
+                    (digest, kind, name, filename, datetime.now().isoformat(timespec="seconds")),
+                ).lastrowid
+            except sqlite3.IntegrityError:
+                return None
+            db.executemany(
+                "INSERT INTO forekomster (ordernummer, dokument_id, sida, antal) VALUES (?, ?, ?, ?)",
+                [(order, document_id, page, qty) for order, page, qty in postings],
+            )
+        return len(postings)
+
+    def import_ledger(self, ledger_path):
+        # Engångsinläsning av dokument som registrerades i orderliggaren innan
+        # indexet fanns. Där finns inga sidnummer, bara antal per dokument.
+        if not os.path.exists(ledger_path):
+            return 0
+        with self._lock, self._connect() as db:
+            if db.execute("SELECT 1 FROM dokument LIMIT 1").fetchone():
+                return 0
+            db.execute("ATTACH DATABASE ? AS liggare", (ledger_path,))
+            db.execute("INSERT INTO dokument (id, hash, typ, namn, registrerad)"
+                       " SELECT id, hash, typ, namn, registrerad FROM liggare.dokument")
+            return db.execute("INSERT INTO forekomster (ordernummer, dokument_id, sida, antal)"
+                              " SELECT ordernummer, dokument_id, NULL, antal FROM liggare.poster").rowcount
+
+    def lookup(self, text, limit=200):
+        text = text.strip()
+        if not text.isdigit():
+            return []
+        if len(text) == 7:
+            where, params = "f.ordernummer = ?", [text]
+        else:
+            where, params = "f.ordernummer >= ? AND f.ordernummer < ?", list(_prefix_range(text))
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT f.ordernummer AS Ordernummer, d.typ AS Typ, d.namn AS Dokument, f.sida AS Sida,"
+                " f.antal AS Antal, d.fil AS Fil, d.registrerad AS Registrerad"
+                f" FROM forekomster f JOIN dokument d ON d.id = f.dokument_id WHERE {where}"
+                " ORDER BY f.ordernummer, d.registrerad, d.id, f.sida LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        return [dict(row, Typ=DOCUMENT_TYPES.get(row["Typ"], row["Typ"])) for row in rows]
+
+    def count_documents(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM dokument").fetchone()[0]
@@ -0,0 +1,185 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+LEDGER_PATH = "orderliggare.sqlite"
+CONFIRMATION = "bekraftelse"
+INVOICE = "faktura"
+# SQLite begränsar antalet parametrar per fråga.
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dokument (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    typ TEXT NOT NULL,
+    namn TEXT NOT NULL,
+    leverantor TEXT,
+    registrerad TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS poster (
+    dokument_id INTEGER NOT NULL REFERENCES dokument (id),
+    ordernummer TEXT NOT NULL,
+    antal INTEGER NOT NULL,
+    PRIMARY KEY (dokument_id, ordernummer)
+);
+CREATE INDEX IF NOT EXISTS poster_order ON poster (ordernummer);
+CREATE TABLE IF NOT EXISTS ordrar (
+    ordernummer TEXT PRIMARY KEY,
+    bekraftat INTEGER NOT NULL DEFAULT 0,
+    fakturerat INTEGER NOT NULL DEFAULT 0,
+    dokument INTEGER NOT NULL DEFAULT 0,
+    uppdaterad TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ordrar_uppdaterad ON ordrar (uppdaterad);
+"""
+
+_ORDER_COLUMNS = (
+    "ordernummer AS Ordernummer, bekraftat AS 'Antal (Leveransbekräftelse)', fakturerat AS 'Antal (Faktura)',"
+    " CASE WHEN bekraftat = fakturerat THEN 'JA' ELSE 'NEJ' END AS 'Matchar?',"
+    " fakturerat - bekraftat AS Differens, dokument AS Dokument, uppdaterad AS Uppdaterad"
+)
+
+
+def ledger_csv(ledger):
+    lines = ["Ordernummer;Antal (Leveransbekräftelse);Antal (Faktura);Differens"]
+    lines.extend(f"{order};{confirmed};{invoiced};{invoiced - confirmed}"
+                 for order, confirmed, invoiced in ledger.totals().iter_sorted())
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), _CHUNK):
+        yield values[start:start + _CHUNK]
+
+
+class OrderLedger:
+    # Löpande summor per ordernummer över alla registrerade dokument. Varje
+    # dokument registreras en gång (per innehållshash) och uppdaterar bara
+    # de ordrar det innehåller.
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add_document(self, kind, digest, name, orders, supplier=None):
+        # Returnerar de berörda ordernumren, eller None om dokumentet redan fanns.
+        if kind not in (CONFIRMATION, INVOICE):
+            raise ValueError(f"Okänd dokumenttyp: {kind}")
+        column = "bekraftat" if kind == CONFIRMATION else "fakturerat"
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = [(order, int(qty)) for order, qty in orders.items() if qty]
+        with self._lock, self._connect() as db:
+            try:
+                document_id = db.execute(
+                    "INSERT INTO dokument (hash, typ, namn, leverantor, registrerad) VALUES (?, ?, ?, ?, ?)",
+                    (digest, kind, name, supplier, now),
+                ).lastrowid
+            except sqlite3.IntegrityError:
+                return None
+            db.executemany(
+                "INSERT INTO poster (dokument_id, ordernummer, antal) VALUES (?, ?, ?)",
+                [(document_id, order, qty) for order, qty in rows],
+            )
+            db.executemany(
+                f"INSERT INTO ordrar (ordernummer, {column}, dokument, uppdaterad) VALUES (?, ?, 1, ?)"
+                f" ON CONFLICT (ordernummer) DO UPDATE SET {column} = {column} + excluded.{column},"
+                " dokument = dokument + 1, uppdaterad = excluded.uppdaterad",
+                [(order, qty, now) for order, qty in rows],
+            )
+        return [order for order, _ in rows]
+
+    def remove_document(self, digest):
+        # Backar ett felaktigt registrerat dokument; bara dess ordrar räknas om.
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._connect() as db:
+            found = db.execute("SELECT id, typ FROM dokument WHERE hash = ?", (digest,)).fetchone()
+            if found is None:
+                return None
+            document_id, kind = found
+            column = "bekraftat" if kind == CONFIRMATION else "fakturerat"
+            rows = db.execute("SELECT ordernummer, antal FROM poster WHERE dokument_id = ?", (document_id,)).fetchall()
+            db.executemany(
+                f"UPDATE ordrar SET {column} = {column} - ?, dokument = dokument - 1, uppdaterad = ?"
+                " WHERE ordernummer = ?",
+                [(qty, now, order) for order, qty in rows],
+            )
+            db.execute("DELETE FROM ordrar WHERE dokument <= 0")
+            db.execute("DELETE FROM poster WHERE dokument_id = ?", (document_id,))
+            db.execute("DELETE FROM dokument WHERE id = ?", (document_id,))
+        return [order for order, _ in rows]
+
+    def orders(self, numbers):
+        result = []
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            for chunk in _chunks(numbers):
+                result.extend(dict(row) for row in db.execute(
+                    f"SELECT {_ORDER_COLUMNS} FROM ordrar WHERE ordernummer IN ({', '.join('?' * len(chunk))})"
+                    " ORDER BY ordernummer", chunk))
+        return result
+
+    @staticmethod
+    def _filter(text, only_open):
+        clauses, params = [], []
+        if text:
+            clauses.append("ordernummer LIKE ?")
+            params.append(f"%{text}%")
+        if only_open:
+            clauses.append("bekraftat != fakturerat")
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, text="", only_open=False):
+        where, params = self._filter(text, only_open)
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM ordrar {where}", params).fetchone()[0]
+
+    def search(self, text="", only_open=False, limit=50, offset=0):
+        where, params = self._filter(text, only_open)
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                f"SELECT {_ORDER_COLUMNS} FROM ordrar {where} ORDER BY uppdaterad DESC, ordernummer LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def totals(self, batch_size=50000):
+        # Hela liggaren som kompakta kolumner (se antalslager.py), hämtad i
+        # block så att raderna aldrig ligger som Python-tupler på en gång.
+        import numpy as np
+        from antalslager import QuantityStore
+
+        parts = []
+        with self._connect() as db:
+            cursor = db.execute(
+                "SELECT CAST(ordernummer AS INTEGER), bekraftat, fakturerat FROM ordrar ORDER BY ordernummer")
+            while rows := cursor.fetchmany(batch_size):
+                parts.append(np.array(rows, dtype=np.int64))
+        if not parts:
+            return QuantityStore()
+        columns = np.concatenate(parts)
+        return QuantityStore(columns[:, 0].copy(), columns[:, 1].copy(), columns[:, 2].copy())
+
+    def documents(self, order):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                "SELECT d.typ AS Typ, d.namn AS Dokument, p.antal AS Antal, d.registrerad AS Registrerad"
+                " FROM poster p JOIN dokument d ON d.id = p.dokument_id WHERE p.ordernummer = ?"
+                " ORDER BY d.registrerad, d.id",
+                (order,),
+            ).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,79 @@
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# Antal processer för sidparallell PDF-tolkning. 1 = seriellt (standard), 0 = en per kärna.
+WORKERS_ENV = "ORDERKONTROLL_WORKERS"
+# Under detta antal sidor lönar det sig inte att starta processer.
+MIN_PAGES_PER_WORKER = 4
+
+
+def default_workers():
+    try:
+        return int(os.environ.get(WORKERS_ENV, "1"))
+    except ValueError:
+        return 1
+
+
+def resolve_workers(workers):
+    if workers is None:
+        workers = default_workers()
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def read_pdf_bytes(pdf_file):
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+
+def as_pdf_source(pdf_file):
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return io.BytesIO(pdf_file)
+    return pdf_file
+
+
+def page_chunks(page_count, workers):
+    size = max(MIN_PAGES_PER_WORKER, -(-page_count // workers))
+    return [range(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def process_pool(workers):
+    # spawn i stället för fork: Streamlit-servern är flertrådad.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def map_page_chunks(worker, data, page_count, workers=None, local=None, progress=None):
+    # progress anropas med antal färdiga sidor efter varje klar del.
+    workers = resolve_workers(workers)
+    chunks = page_chunks(page_count, workers)
+    if workers > 1 and len(chunks) > 1:
+        try:
+            with process_pool(min(workers, len(chunks))) as pool:
+                futures = [pool.submit(worker, data, chunk) for chunk in chunks]
+                if progress is not None:
+                    for future in as_completed(futures):
+                        progress(len(future.result()))
+                results = [future.result() for future in futures]
+            return [page for chunk in results for page in chunk]
+        except (OSError, BrokenProcessPool):
+            pass
+    # Seriellt används det redan öppnade dokumentet om anroparen har ett.
+    source = data if local is None else local
+    if progress is None:
+        return worker(source, range(page_count))
+    pages = []
+    for number in range(page_count):
+        pages.extend(worker(source, range(number, number + 1)))
+        progress(1)
+    return pages
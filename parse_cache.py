@@ -0,0 +1,182 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+
+CACHE_DIR = "tolkningscache"
+# Höj när parsrarna ändras så att gamla resultat på disk inte återanvänds.
+CACHE_VERSION = 6
+
+HIT = "träff"
+DISK_HIT = "träff (disk)"
+MISS = "miss"
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def combined_hash(*digests):
+    return content_hash("-".join(digests).encode("ascii"))
+
+
+class ParseCache:
+    # Delas av alla sessioner i processen (st.cache_resource). Minnet begränsas
+    # både i antal och storlek, och poster som inte använts inom ttl släpps.
+    def __init__(self, directory=CACHE_DIR, max_items=32, max_disk_bytes=256 * 1024 * 1024,
+                 max_memory_bytes=256 * 1024 * 1024, ttl=3600, disk_ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl = ttl
+        self.disk_ttl = disk_ttl
+        # nyckel -> (värde, storlek i byte, senast använd)
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._pending = {}
+        self._stats = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        kind, digest = key
+        return os.path.join(self.directory, f"v{CACHE_VERSION}-{kind}-{digest}.pkl")
+
+    def _lookup(self, kind, digest):
+        key = (kind, digest)
+        now = time.time()
+        with self._lock:
+            self._expire_memory(now)
+            if key in self._memory:
+                value, size, _ = self._memory[key]
+                self._memory[key] = (value, size, now)
+                self._memory.move_to_end(key)
+                return value, HIT
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+            value = pickle.loads(payload)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None, MISS
+        # Rör filen så att diskutrymmet rensas i LRU-ordning.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._remember(key, value, len(payload))
+        return value, DISK_HIT
+
+    def get(self, kind, digest):
+        value, outcome = self._lookup(kind, digest)
+        self._count(kind, outcome)
+        return value
+
+    def put(self, kind, digest, value):
+        key = (kind, digest)
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, value, len(payload))
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict_disk()
+
+    def get_or_compute(self, kind, digest, compute):
+        key = (kind, digest)
+        while True:
+            value, outcome = self._lookup(kind, digest)
+            if value is not None:
+                self._count(kind, outcome)
+                return value
+            # Laddar någon annan session upp samma dokument samtidigt väntar
+            # vi in den tolkningen i stället för att göra om den.
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            pending.wait()
+        self._count(kind, MISS)
+        try:
+            value = compute()
+            self.put(kind, digest, value)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def get_or_parse(self, kind, data, parse):
+        return self.get_or_compute(kind, content_hash(data), lambda: parse(data))
+
+    def stats(self):
+        with self._lock:
+            self._expire_memory(time.time())
+            counts = dict(self._stats)
+            return {
+                "poster": len(self._memory),
+                "minne_byte": self._memory_bytes,
+                "träffar": sum(n for (_, outcome), n in counts.items() if outcome != MISS),
+                "missar": sum(n for (_, outcome), n in counts.items() if outcome == MISS),
+                "per_typ": counts,
+            }
+
+    def _count(self, kind, outcome):
+        with self._lock:
+            self._stats[(kind, outcome)] += 1
+
+    def _remember(self, key, value, size):
+        now = time.time()
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key)[1]
+            if size > self.max_memory_bytes:
+                return
+            self._memory[key] = (value, size, now)
+            self._memory_bytes += size
+            while len(self._memory) > self.max_items or self._memory_bytes > self.max_memory_bytes:
+                self._memory_bytes -= self._memory.popitem(last=False)[1][1]
+
+    def _expire_memory(self, now):
+        # Minnet hålls i LRU-ordning, så de äldsta posterna ligger först.
+        while self._memory:
+            key, (_, size, used) = next(iter(self._memory.items()))
+            if now - used <= self.ttl:
+                break
+            del self._memory[key]
+            self._memory_bytes -= size
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        cutoff = time.time() - self.disk_ttl
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_disk_bytes and mtime >= cutoff:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
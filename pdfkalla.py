@@ -0,0 +1,108 @@
+import threading
+from contextlib import contextmanager
+
+from parallel import as_pdf_source, read_pdf_bytes
+
+# pdfium: snabb ren text (pypdfium2, följer med pdfplumber), men i den ordning
+#         texten ritas i sidan, inte i läsordning.
+# pypdf: ren text via PyPDF2.
+# pdfplumber: layoutmedveten med tecken- och ordkoordinater, långsammast.
+BACKENDS = ("pdfium", "pypdf", "pdfplumber")
+# pdfplumber grupperar texten i rader efter position, som de ursprungliga
+# parsrarna förutsatte. pdfium väljs per layout först när det gett samma
+# resultat på riktiga dokument.
+DEFAULT_BACKEND = "pdfplumber"
+
+# pdfium är inte trådsäkert; alla anrop i processen går genom samma lås.
+_pdfium_lock = threading.RLock()
+
+
+class PdfSource:
+    def __init__(self, pdf_file, backend=DEFAULT_BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"Okänd PDF-backend: {backend}")
+        self.backend = backend
+        # Byten behålls så att samma källa kan lämnas vidare till parsrar och
+        # processer utan att filen läses eller öppnas igen.
+        self._data = read_pdf_bytes(pdf_file)
+        if backend == "pdfium":
+            import pypdfium2
+            with _pdfium_lock:
+                self._doc = pypdfium2.PdfDocument(self._data)
+                self._page_count = len(self._doc)
+        elif backend == "pypdf":
+            from PyPDF2 import PdfReader
+            self._doc = PdfReader(as_pdf_source(self._data))
+            self._page_count = len(self._doc.pages)
+        else:
+            import pdfplumber
+            self._doc = pdfplumber.open(as_pdf_source(self._data))
+            self._page_count = len(self._doc.pages)
+
+    def __len__(self):
+        return self._page_count
+
+    def getvalue(self):
+        return self._data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.backend == "pdfium":
+            with _pdfium_lock:
+                self._doc.close()
+        elif self.backend == "pdfplumber":
+            self._doc.close()
+
+    def page_text(self, number):
+        if self.backend == "pdfium":
+            with _pdfium_lock:
+                page = self._doc[number]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+            return text
+        if self.backend == "pypdf":
+            return self._doc.pages[number].extract_text() or ""
+        page = self._doc.pages[number]
+        text = page.extract_text() or ""
+        page.close()
+        return text
+
+    def page_lines(self, number):
+        return self.page_text(number).splitlines()
+
+    def iter_page_lines(self, page_numbers=None, progress=None):
+        for number in page_numbers if page_numbers is not None else range(self._page_count):
+            for line in self.page_lines(number):
+                yield number, line
+            if progress is not None:
+                progress(1)
+
+    def iter_lines(self, page_numbers=None, progress=None):
+        for _, line in self.iter_page_lines(page_numbers, progress):
+            yield line
+
+    def plumber_page(self, number):
+        if self.backend != "pdfplumber":
+            raise ValueError("Layoutdata kräver backend 'pdfplumber'")
+        return self._doc.pages[number]
+
+
+@contextmanager
+def open_pdf(pdf_file, backend=DEFAULT_BACKEND):
+    # Ett redan öppnat dokument lånas ut utan att stängas, så att varje
+    # dokument bara öppnas en gång även när det skickas vidare. Bara en annan
+    # backend kräver att det öppnas på nytt.
+    if isinstance(pdf_file, PdfSource):
+        if pdf_file.backend == backend:
+            yield pdf_file
+            return
+        pdf_file = pdf_file.getvalue()
+    with PdfSource(pdf_file, backend) as doc:
+        yield doc
@@ -0,0 +1,168 @@
+from bisect import bisect_right
+from collections import defaultdict
+from functools import partial
+
+
+from parallel import map_page_chunks
+from pdfkalla import open_pdf
+from suppliers import DEFAULT_SUPPLIER, layout
+
+
+def iter_confirmation_orders(lines, supplier=DEFAULT_SUPPLIER):
+    current_order = None
+    found_qty = False
+
+    for event, value in layout(supplier, "bekraftelse").events(lines):
+        if event == "order":
+            current_order = value
+            found_qty = False
+        elif event == "order_qty":
+            current_order, qty = value
+            found_qty = False
+            if qty is not None and 0 < qty < 500:
+                found_qty = True
+                yield current_order, qty
+        elif event == "qty" and current_order and not found_qty:
+            if 0 < value < 500:
+                yield current_order, value
+                found_qty = True
+                current_order = None
+
+
+def sum_postings(postings):
+    orders = defaultdict(int)
+    for order, _, qty in postings:
+        orders[order] += qty
+    return orders
+
+
+def extract_confirmation_postings(pdf_file, supplier=DEFAULT_SUPPLIER, progress=None):
+    # (order, sida, antal) per post; sidan (1-baserad) är den där antalet stod.
+    page = [0]
+
+    def tracked(numbered_lines):
+        for number, line in numbered_lines:
+            page[0] = number + 1
+            yield line
+
+    with open_pdf(pdf_file, layout(supplier, "bekraftelse").backend) as doc:
+        lines = tracked(doc.iter_page_lines(progress=progress))
+        return [(order, page[0], qty) for order, qty in iter_confirmation_orders(lines, supplier)]
+
+
+def extract_orders_from_confirmation(pdf_file, supplier=DEFAULT_SUPPLIER, progress=None):
+    return sum_postings(extract_confirmation_postings(pdf_file, supplier, progress))
+
+
+def _invoice_page_orders(lines, supplier=DEFAULT_SUPPLIER):
+    orders = defaultdict(int)
+    invoice_id = ""
+    header = layout(supplier, "fakturahuvud").match(" ".join(lines))
+    if header is not None:
+        invoice_id = header[1]
+
+    current_order = None
+    for event, value in layout(supplier, "faktura").events(lines):
+        if event == "order":
+            current_order = value
+        elif event == "qty" and current_order is not None and 0 < value < 500:
+            orders[current_order] += value
+    return orders, invoice_id
+
+
+# Toleranser i punkter för kolumn- och raduppdelning av ord.
+COLUMN_TOLERANCE = 20
+ROW_TOLERANCE = 3
+
+
+def _reading_order(words):
+    rows = []
+    row_top = None
+    for word in sorted(words, key=lambda w: w["top"]):
+        if row_top is None or word["top"] - row_top > ROW_TOLERANCE:
+            rows.append([])
+            row_top = word["top"]
+        rows[-1].append(word)
+    return [word for row in rows for word in sorted(row, key=lambda w: w["x0"])]
+
+
+def _column_texts(words, anchor):
+    bounds = []
+    for x0 in sorted(word["x0"] for word in words if anchor.match(word["text"])):
+        if not bounds or x0 - bounds[-1] > COLUMN_TOLERANCE:
+            bounds.append(x0)
+    columns = [[] for _ in bounds or [0]]
+    for word in words:
+        index = max(bisect_right(bounds, word["x0"] + COLUMN_TOLERANCE) - 1, 0)
+        columns[index].append(word["text"])
+    return [" ".join(column) for column in columns]
+
+
+def _invoice_page_orders_columns(page, supplier=DEFAULT_SUPPLIER):
+    # Orden och deras koordinater läses en gång per sida. Varje kolumn blir en
+    # löpande text, så poster som bryts över flera rader hålls ihop.
+    invoice_layout = layout(supplier, "faktura")
+    words = _reading_order(page.extract_words())
+    page.close()
+    orders = defaultdict(int)
+    invoice_id = ""
+    header = layout(supplier, "fakturahuvud").match(" ".join(word["text"] for word in words))
+    if header is not None:
+        invoice_id = header[1]
+
+    for text in _column_texts(words, invoice_layout.column_anchor):
+        current_order = None
+        for event, value in invoice_layout.scan(text):
+            if event == "order":
+                current_order = value
+            elif event == "qty" and current_order is not None and 0 < value < 500:
+                orders[current_order] += value
+    return orders, invoice_id
+
+
+def _invoice_pages(source, page_numbers, supplier=DEFAULT_SUPPLIER):
+    invoice_layout = layout(supplier, "faktura")
+    with open_pdf(source, invoice_layout.backend) as doc:
+        if invoice_layout.column_anchor is not None:
+            return [_invoice_page_orders_columns(doc.plumber_page(n), supplier) for n in page_numbers]
+        return [_invoice_page_orders(doc.page_lines(n), supplier) for n in page_numbers]
+
+
+def extract_invoice_postings(pdf_file, workers=None, supplier=DEFAULT_SUPPLIER, progress=None):
+    postings = []
+    invoice_id = ""
+    with open_pdf(pdf_file, layout(supplier, "faktura").backend) as doc:
+        pages = map_page_chunks(partial(_invoice_pages, supplier=supplier), doc.getvalue(), len(doc), workers,
+                                local=doc, progress=progress)
+    for number, (page_orders, page_invoice_id) in enumerate(pages, 1):
+        if page_invoice_id:
+            invoice_id = page_invoice_id
+        postings.extend((order, number, qty) for order, qty in page_orders.items())
+    return postings, invoice_id
+
+
+def extract_orders_from_invoice(pdf_file, workers=None, supplier=DEFAULT_SUPPLIER, progress=None):
+    postings, invoice_id = extract_invoice_postings(pdf_file, workers, supplier, progress)
+    return sum_postings(postings), invoice_id
+
+
+MATCH_STATUS = ["JA", "NEJ"]
+
+
+def compare_orders(confirmation, invoice):
+    # pandas laddas först här så att tolkning och appstart klarar sig utan det.
+    import pandas as pd
+    from antalslager import QuantityStore
+
+    # Parsrarna sparar bara antal > 0, så ett nollantal betyder att ordern saknas i dokumentet.
+    store = QuantityStore.from_counts(confirmation, invoice)
+    matches = store.confirmed == store.invoiced
+    return pd.DataFrame({
+        "Ordernummer": pd.array(store.order_numbers(), dtype=str),
+        "Antal (Leveransbekräftelse)": store.confirmed,
+        "Antal (Faktura)": store.invoiced,
+        "Matchar?": pd.Categorical.from_codes((~matches).astype("int8"), categories=MATCH_STATUS),
+        "Differens": store.difference(),
+        "Endast i leveransbekräftelse": store.invoiced == 0,
+        "Endast i faktura": store.confirmed == 0,
+    })
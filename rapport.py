@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+HEADERS = ["Ordernummer", "Antal (Leveransbekräftelse)", "Antal (Faktura)", "Matchar?"]
+COL_WIDTHS = [40, 70, 40, 30]
+ROW_HEIGHT = 10
+HEADER_FILL = (230, 230, 230)
+MISMATCH_FILL = (255, 215, 215)
+# fpdf:s standardmarginal i mm vid automatisk sidbrytning.
+BOTTOM_MARGIN = 20
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdfrapport")
+
+
+def report_filename(faktura_id, leverans_id):
+    return f"{faktura_id}-{leverans_id}-{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+
+
+def _table_header(pdf):
+    pdf.set_font("Arial", 'B', 12)
+    pdf.set_fill_color(*HEADER_FILL)
+    for width, header in zip(COL_WIDTHS, HEADERS):
+        pdf.cell(width, ROW_HEIGHT, header, 1, 0, 'C', fill=True)
+    pdf.ln()
+    pdf.set_font("Arial", size=12)
+    pdf.set_fill_color(*MISMATCH_FILL)
+
+
+def write_pdf_report(df, filepath):
+    from fpdf import FPDF
+
+    # Kolumnerna hämtas som listor en gång i stället för en Series per rad.
+    columns = [df[header].astype(str).tolist() for header in HEADERS]
+    mismatches = (df["Matchar?"] == "NEJ").tolist()
+
+    pdf = FPDF()
+    # Sidbrytningen sköts här nedan. Marginalen anges igen eftersom fpdf
+    # nollställer den när automatisk sidbrytning stängs av.
+    pdf.set_auto_page_break(False, margin=BOTTOM_MARGIN)
+    pdf.add_page()
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(0, 10, "Orderjämförelse: Leveransbekräftelse vs Faktura", ln=True)
+    pdf.ln(5)
+    _table_header(pdf)
+
+    page_bottom = pdf.h - pdf.b_margin
+    for row, mismatch in zip(zip(*columns), mismatches):
+        if pdf.get_y() + ROW_HEIGHT > page_bottom:
+            pdf.add_page()
+            _table_header(pdf)
+        for width, value in zip(COL_WIDTHS, row):
+            pdf.cell(width, ROW_HEIGHT, value, 1, 0, fill=mismatch)
+        pdf.ln()
+    pdf.output(filepath)
+    return filepath
+
+
+def generate_pdf_report(df, faktura_id, leverans_id, directory):
+    return write_pdf_report(df, os.path.join(directory, report_filename(faktura_id, leverans_id)))
+
+
+def generate_pdf_report_async(df, faktura_id, leverans_id, directory):
+    filepath = os.path.join(directory, report_filename(faktura_id, leverans_id))
+    return filepath, _executor.submit(write_pdf_report, df.copy(), filepath)
+
+
+def read_report(future):
+    with open(future.result(), "rb") as f:
+        return f.read()
@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+INDEX_FILENAME = "index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rapporter (
+    id INTEGER PRIMARY KEY,
+    faktura_id TEXT NOT NULL,
+    leverans_id TEXT NOT NULL,
+    skapad TEXT NOT NULL,
+    ordrar INTEGER,
+    avvikelser INTEGER,
+    sokvag TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS rapporter_skapad ON rapporter (skapad);
+CREATE INDEX IF NOT EXISTS rapporter_faktura ON rapporter (faktura_id);
+CREATE INDEX IF NOT EXISTS rapporter_leverans ON rapporter (leverans_id);
+"""
+
+
+def _parse_report_filename(filename):
+    # Format från report_filename(): <faktura_id>-<leverans_id>-<ÅÅÅÅMMDDhhmmss>.pdf
+    stem = os.path.splitext(filename)[0]
+    ids, _, stamp = stem.rpartition("-")
+    try:
+        created = datetime.strptime(stamp, "%Y%m%d%H%M%S")
+    except ValueError:
+        return stem, "", None
+    # Fakturanummer kan innehålla bindestreck (PG-0000-10), så leverans-id:t
+    # tas som sista delen.
+    faktura_id, _, leverans_id = ids.rpartition("-")
+    return faktura_id, leverans_id, created
+
+
+class ReportIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add(self, faktura_id, leverans_id, filepath, ordrar=None, avvikelser=None, created=None):
+        created = created or datetime.now()
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO rapporter (faktura_id, leverans_id, skapad, ordrar, avvikelser, sokvag)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (faktura_id, leverans_id, created.isoformat(timespec="seconds"), ordrar, avvikelser, filepath),
+            )
+
+    def import_existing(self):
+        # Engångsinläsning av rapporter som skrevs innan indexet fanns.
+        with self._connect() as db:
+            if db.execute("SELECT 1 FROM rapporter LIMIT 1").fetchone():
+                return 0
+        count = 0
+        for filename in os.listdir(self.directory):
+            if not filename.lower().endswith(".pdf"):
+                continue
+            filepath = os.path.join(self.directory, filename)
+            faktura_id, leverans_id, created = _parse_report_filename(filename)
+            if created is None:
+                created = datetime.fromtimestamp(os.path.getmtime(filepath))
+            self.add(faktura_id, leverans_id, filepath, created=created)
+            count += 1
+        return count
+
+    @staticmethod
+    def _filter(text):
+        if not text:
+            return "", []
+        return "WHERE faktura_id LIKE ? OR leverans_id LIKE ? OR sokvag LIKE ?", [f"%{text}%"] * 3
+
+    def count(self, text=""):
+        where, params = self._filter(text)
+        with self._connect() as db:
+            return db.execute(f"SELECT COUNT(*) FROM rapporter {where}", params).fetchone()[0]
+
+    def search(self, text="", limit=20, offset=0):
+        where, params = self._filter(text)
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute(
+                f"SELECT * FROM rapporter {where} ORDER BY skapad DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def read_file(filepath):
+    with open(filepath, "rb") as f:
+        return f.read()
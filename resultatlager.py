@@ -0,0 +1,86 @@
+import glob
+import os
+
+RESULT_SUFFIX = ".parquet"
+RESULT_ID_COLUMNS = ("Faktura-id", "Leverans-id", "Rapport")
+
+
+def _id_type():
+    import pyarrow as pa
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def _with_id_types(schema):
+    for column in RESULT_ID_COLUMNS:
+        i = schema.get_field_index(column)
+        if i >= 0:
+            schema = schema.set(i, schema.field(i).with_type(_id_type()))
+    return schema
+
+
+def result_path(report_path):
+    return os.path.splitext(report_path)[0] + RESULT_SUFFIX
+
+
+def save_result(df, report_path, faktura_id, leverans_id):
+    import pandas as pd
+
+    path = result_path(report_path)
+    stored = df.assign(**{
+        "Faktura-id": pd.Categorical([faktura_id] * len(df)),
+        "Leverans-id": pd.Categorical([leverans_id] * len(df)),
+        "Rapport": pd.Categorical([os.path.basename(report_path)] * len(df)),
+    })
+    # En tom jämförelse skulle annars ge id-kolumner av typen null.
+    import pyarrow as pa
+    table = pa.Table.from_pandas(stored, preserve_index=False)
+    table = table.cast(_with_id_types(table.schema))
+    import pyarrow.parquet as pq
+    pq.write_table(table, path)
+    return path
+
+
+def load_result(report_path):
+    import pandas as pd
+
+    path = result_path(report_path)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path).drop(columns=["Faktura-id", "Leverans-id", "Rapport"], errors="ignore")
+
+
+def query_results(directory, columns=None, filters=None):
+    # Läser bara de kolumner och rader som efterfrågas ur alla sparade resultat.
+    import pandas as pd
+
+    paths = sorted(glob.glob(os.path.join(directory, f"*{RESULT_SUFFIX}")))
+    if not paths:
+        return pd.DataFrame(columns=columns or [])
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    # Schemat tas annars från första filen; id-kolumnerna sätts uttryckligen så
+    # att även äldre tomma resultat (null-typade id:n) läses rätt.
+    schema = _with_id_types(pq.read_schema(paths[0]))
+    dataset = ds.dataset(paths, schema=schema, format="parquet")
+    return dataset.to_table(columns=columns, filter=filters).to_pandas()
+
+
+def mismatched_orders(directory):
+    import pyarrow.dataset as ds
+    rows = query_results(
+        directory,
+        columns=["Ordernummer", "Antal (Leveransbekräftelse)", "Antal (Faktura)", "Faktura-id", "Leverans-id", "Rapport"],
+        filters=ds.field("Matchar?") == "NEJ",
+    )
+    if rows.empty:
+        return rows
+    return (
+        rows.groupby("Ordernummer", observed=True)
+        .agg(
+            Avvikelser=("Rapport", "size"),
+            Fakturor=("Faktura-id", lambda ids: ", ".join(sorted(set(map(str, ids))))),
+            Leveranser=("Leverans-id", lambda ids: ", ".join(sorted(set(map(str, ids))))),
+        )
+        .reset_index()
+        .sort_values(["Avvikelser", "Ordernummer"], ascending=[False, True])
+    )
@@ -0,0 +1,82 @@
+import re
+
+from pdfkalla import DEFAULT_BACKEND
+
+
+class Rule:
+    def __init__(self, name, pattern, extract=None, flags=0, anywhere=True):
+        self.name = name
+        self.pattern = pattern
+        self.extract = extract
+        self.flags = flags
+        self.anywhere = anywhere
+        self.groups = re.compile(pattern, flags).groups
+
+
+def _scoped(pattern, flags):
+    letters = "".join(letter for flag, letter in ((re.IGNORECASE, "i"), (re.DOTALL, "s")) if flags & flag)
+    return f"(?{letters}:{pattern})" if letters else f"(?:{pattern})"
+
+
+def _value(rule, m, body):
+    first = body + 1
+    if rule.groups == 0:
+        value = m.group(body)
+    elif rule.groups == 1:
+        value = m.group(first)
+    else:
+        value = m.group(*range(first, first + rule.groups))
+    if rule.extract is not None:
+        value = rule.extract(value)
+    return value
+
+
+class Layout:
+    # Alla regler kompileras till ett enda uttryck, en alternation per regel,
+    # som matchas från radens början. Regelordningen är prioritetsordningen:
+    # den första regel som matchar raden vinner, precis som en if/elif-kedja.
+    #
+    # column_anchor är ett mönster för ordet som inleder varje post i en
+    # kolumnuppdelad layout; det kräver backend "pdfplumber" (se pdfkalla.py).
+    def __init__(self, name, rules, backend=DEFAULT_BACKEND, column_anchor=None):
+        self.name = name
+        self.rules = list(rules)
+        self.backend = backend
+        self.column_anchor = re.compile(column_anchor) if column_anchor else None
+        alternatives = []
+        scan_alternatives = []
+        self._by_group = {}
+        self._scan_by_group = {}
+        group = 1
+        scan_group = 1
+        for rule in self.rules:
+            body = _scoped(rule.pattern, rule.flags)
+            prefix = ".*?" if rule.anywhere else ""
+            alternatives.append(f"({prefix}({body}))")
+            self._by_group[group] = rule
+            group += 2 + rule.groups
+            scan_alternatives.append(f"({body})")
+            self._scan_by_group[scan_group] = rule
+            scan_group += 1 + rule.groups
+        self._regex = re.compile("|".join(alternatives))
+        self._scan_regex = re.compile("|".join(scan_alternatives))
+
+    def match(self, line):
+        m = self._regex.match(line)
+        if m is None:
+            return None
+        # Den yttre gruppen stängs sist, så lastindex pekar ut vinnande regel.
+        rule = self._by_group[m.lastindex]
+        return rule.name, _value(rule, m, m.lastindex + 1)
+
+    def events(self, lines):
+        for line in lines:
+            hit = self.match(line)
+            if hit is not None:
+                yield hit
+
+    def scan(self, text):
+        # Alla träffar i en löpande text från vänster till höger, oavsett radbrytningar.
+        for m in self._scan_regex.finditer(text):
+            rule = self._scan_by_group[m.lastindex]
+            yield rule.name, _value(rule, m, m.lastindex)
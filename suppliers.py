@@ -0,0 +1,64 @@
+import re
+
+from rules import Layout, Rule
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _order_and_qty(values):
+    order, qty = values
+    return order, _int_or_none(qty)
+
+
+def _decimal_qty(value):
+    return int(float(value.replace(",", ".")))
+
+
+# Varje leverantör beskrivs av en uppsättning layouter. Parsrarna i pressglass.py
+# reagerar på regelnamnen, så en ny leverantör behöver bara egna mönster här.
+#
+# bekraftelse:  order_qty (order + antal på samma rad), order (Reorder-rad),
+#               qty (antal på egen rad efter en order)
+# faktura:      order, qty
+# fakturahuvud: invoice_id, matchas mot sidans hela text
+#
+# Layoutens backend (se pdfkalla.py) väljer hur texten tas fram. Parsrarna
+# läser raderna i tur och ordning, så backend måste ge texten i läsordning:
+# bekräftelser läses med PyPDF2 och fakturor med pdfplumber, som förut.
+# backend="pdfium" är snabbare men följer ritordningen och sätts bara för en
+# leverantör vars riktiga dokument ger samma resultat med den.
+PRESSGLASS_INVOICE_RULES = [
+    Rule("order", r"Zamówienie\s*/\s*Order:\s*(\d{7})"),
+    Rule("qty", r"P\s+(\d+(?:[.,]\d+)?)\s*pcs", _decimal_qty, flags=re.IGNORECASE),
+]
+
+SUPPLIERS = {
+    "pressglass": {
+        "bekraftelse": Layout("pressglass/bekraftelse", [
+            Rule("order", r"Reorder\s+(\d{7})"),
+            Rule("order_qty", r"\s*(?:\S+\s+){3}(\d{7})(?:\s+\S+)+?\s+(\S+)\s*$", _order_and_qty, anywhere=False),
+            Rule("qty", r"\s*(\d{1,3})\s*$", int, anywhere=False),
+        ], backend="pypdf"),
+        "faktura": Layout("pressglass/faktura", PRESSGLASS_INVOICE_RULES),
+        "fakturahuvud": Layout("pressglass/fakturahuvud", [
+            Rule("invoice_id", r"Faktura(?:nr|nummer)[:\s]*([\w\d-]+)", flags=re.IGNORECASE),
+        ]),
+    },
+}
+# Täta fakturasidor med flera orderposter bredvid varandra: orden delas upp i
+# kolumner efter x-position, med en kolumn per "Zamówienie"-rubrik.
+SUPPLIERS["pressglass-kolumner"] = dict(
+    SUPPLIERS["pressglass"],
+    faktura=Layout("pressglass-kolumner/faktura", PRESSGLASS_INVOICE_RULES,
+                   backend="pdfplumber", column_anchor=r"Zamówienie"),
+)
+DEFAULT_SUPPLIER = "pressglass"
+
+
+def layout(supplier, document):
+    return SUPPLIERS[supplier][document]
@@ -0,0 +1,96 @@
+# Parsrarna som de såg ut före de regelstyrda layouterna (suppliers.py), med
+# samma logik men uppdelade så att de även kan köras på färdiga textrader.
+import re
+from collections import defaultdict
+
+
+def confirmation_orders_from_lines(lines):
+    orders = defaultdict(int)
+    current_order = None
+    found_qty = False
+
+    for i, line in enumerate(lines):
+        reorder_match = re.search(r"Reorder\s+(\d{7})", line)
+        if reorder_match:
+            current_order = reorder_match.group(1)
+            found_qty = False
+            continue
+
+        parts = line.strip().split()
+        if len(parts) >= 6:
+            possible_order = parts[3]
+            if re.fullmatch(r"\d{7}", possible_order):
+                current_order = possible_order
+                found_qty = False
+                try:
+                    qty = int(parts[-1])
+                    if 0 < qty < 500:
+                        orders[current_order] += qty
+                        found_qty = True
+                except ValueError:
+                    continue
+                continue
+
+        if current_order and not found_qty:
+            fallback_qty_match = re.fullmatch(r"\s*(\d{1,3})\s*", line)
+            if fallback_qty_match:
+                try:
+                    qty = int(fallback_qty_match.group(1))
+                    if 0 < qty < 500:
+                        orders[current_order] += qty
+                        found_qty = True
+                        current_order = None
+                except ValueError:
+                    continue
+    return orders
+
+
+def invoice_page_orders(lines):
+    orders = defaultdict(int)
+    invoice_id = ""
+    order_indices = []
+    invoice_id_match = re.search(r"Faktura(?:nr|nummer)[:\s]*([\w\d-]+)", " ".join(lines), re.IGNORECASE)
+    if invoice_id_match:
+        invoice_id = invoice_id_match.group(1)
+
+    for idx, line in enumerate(lines):
+        match = re.search(r"Zamówienie\s*/\s*Order:\s*(\d{7})", line)
+        if match:
+            order_indices.append((idx, match.group(1)))
+
+    order_indices.append((len(lines), None))
+
+    for i in range(len(order_indices) - 1):
+        start, current_order = order_indices[i]
+        end, _ = order_indices[i + 1]
+        for j in range(start + 1, end):
+            qty_match = re.search(r"P\s+(\d+(?:[.,]\d+)?)\s*pcs", lines[j], re.IGNORECASE)
+            if qty_match:
+                try:
+                    qty = int(float(qty_match.group(1).replace(",", ".")))
+                    if 0 < qty < 500:
+                        orders[current_order] += qty
+                except ValueError:
+                    continue
+    return orders, invoice_id
+
+
+def extract_orders_from_confirmation(pdf_file):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(pdf_file)
+    text = "\n".join(page.extract_text() for page in reader.pages)
+    return confirmation_orders_from_lines(text.splitlines())
+
+
+def extract_orders_from_invoice(pdf_file):
+    import pdfplumber
+    orders = defaultdict(int)
+    invoice_id = ""
+    with pdfplumber.open(pdf_file) as pdf:
+        for page in pdf.pages:
+            page_orders, page_invoice_id = invoice_page_orders(page.extract_text().split("\n"))
+            if page_invoice_id:
+                invoice_id = page_invoice_id
+            for order, qty in page_orders.items():
+                orders[order] += qty
+    return orders, invoice_id
@@ -0,0 +1,35 @@
+# Baslinjen från granskningarna ska både lägga till och ta bort flaggor.
+from granskningar import MIN_OBSERVATIONS, OK, REJECTED, ReviewStore
+from orderanalys import attribute_rows, find_anomalies
+
+
+def _order(colours):
+    lines = []
+    for row, colour in enumerate(colours, 1):
+        lines += [f"Rad {row}", "AF 100 1200x1400", colour, "Handtag vit"]
+    return attribute_rows(lines)
+
+
+def _review(store, order, status, rounds):
+    for _ in range(rounds):
+        store.add_review("order", [(anomaly, status) for anomaly in find_anomalies(order, store.baseline)])
+
+
+def test_mostly_accepted_deviation_is_not_flagged(tmp_path):
+    store = ReviewStore(str(tmp_path))
+    order = _order(["Färg vit", "Färg vit", "Färg svart"])
+    _review(store, order, OK, MIN_OBSERVATIONS - 1)
+    assert [anomaly["Avvikelse"] for anomaly in find_anomalies(order, store.baseline)] == ["Färg svart"]
+
+    _review(store, order, OK, 1)
+    assert find_anomalies(order, store.baseline) == []
+    # Baslinjen läses tillbaka från databasen med samma utfall.
+    assert find_anomalies(order, ReviewStore(str(tmp_path)).baseline) == []
+
+
+def test_mostly_rejected_line_is_flagged_when_it_follows_the_order(tmp_path):
+    store = ReviewStore(str(tmp_path))
+    _review(store, _order(["Färg vit", "Färg vit", "Färg svart"]), REJECTED, MIN_OBSERVATIONS)
+    anomalies = find_anomalies(_order(["Färg svart", "Färg svart", "Färg vit"]), store.baseline)
+    assert [(anomaly["Avvikelse"], anomaly["Förväntat"], anomaly["Andel EJ OK"]) for anomaly in anomalies] == [
+        ("Färg svart", "Färg vit", 1.0), ("Färg svart", "Färg vit", 1.0)]
@@ -0,0 +1,51 @@
+# Inkorgen ska överleva att en arbetsprocess dödas, t.ex. när minnet tar slut.
+import os
+import signal
+import time
+
+from benchmarks.syntetiska import _write_pdf, confirmation_pages
+from inkorg import WAITING_DIR, Inbox
+from parse_cache import ParseCache
+
+
+def _inbox(tmp_path):
+    return Inbox(str(tmp_path / "inkorg"), str(tmp_path / "historik"), str(tmp_path / "granskade"),
+                 str(tmp_path / "liggare.sqlite"), str(tmp_path / "orderindex.sqlite"), workers=2,
+                 cache=ParseCache(str(tmp_path / "cache")))
+
+
+def _confirmations(inbox, seeds):
+    for seed in seeds:
+        pages, _ = confirmation_pages(1, seed=seed)
+        _write_pdf(pages, os.path.join(inbox.directory, f"bekraftelse-{seed}.pdf"))
+
+
+def test_killed_worker_replaces_pool(tmp_path):
+    inbox = _inbox(tmp_path)
+    try:
+        _confirmations(inbox, range(2))
+        inbox.poll(settle=False)
+        pool = inbox._pool
+        for process in list(pool._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        deadline = time.monotonic() + 10
+        while not pool._broken and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        # Nästa filer tolkas i en ny pool i stället för att poll() kastar BrokenProcessPool.
+        _confirmations(inbox, range(2, 4))
+        inbox.poll(settle=False)
+        assert inbox._pool is not pool
+        assert sorted(os.listdir(os.path.join(inbox.directory, WAITING_DIR))) == [
+            f"bekraftelse-{seed}.pdf" for seed in range(4)]
+    finally:
+        inbox.close()
+
+
+def test_file_removed_before_stat_is_skipped(tmp_path, monkeypatch):
+    inbox = _inbox(tmp_path)
+    _confirmations(inbox, range(1))
+    # Filen "borta.pdf" listas men hinner tas bort innan den undersöks.
+    monkeypatch.setattr(os, "listdir", lambda path: ["borta.pdf", "bekraftelse-0.pdf"])
+    monkeypatch.setattr(os.path, "isfile", lambda path: True)
+    assert inbox._ready_files(settle=False) == [os.path.join(inbox.directory, "bekraftelse-0.pdf")]
@@ -0,0 +1,121 @@
+# De regelstyrda parsrarna ska ge samma resultat som de ursprungliga
+# (tests/referens_pressglass.py), både rad för rad och på hela PDF:er.
+import pytest
+from fpdf import FPDF
+
+from benchmarks.syntetiska import confirmation_pages, invoice_pages
+from pressglass import (_invoice_page_orders, extract_orders_from_confirmation, extract_orders_from_invoice,
+                        iter_confirmation_orders, sum_postings)
+from referens_pressglass import (confirmation_orders_from_lines, extract_orders_from_confirmation as
+                                 reference_confirmation_pdf, extract_orders_from_invoice as reference_invoice_pdf,
+                                 invoice_page_orders)
+
+CONFIRMATION_CASES = {
+    "antal på orderraden": ["1 Okno PVC 1234567 1200x1400 5", "2 Okno PVC 2345678 900x900 12"],
+    "reorder med antal på egen rad": ["Reorder 3456789", "7", "Reorder 4567890", "Extra text", "3"],
+    "reorder mitt i raden": ["Se Reorder 5678901 nedan", "4"],
+    "icke-numerisk sista kolumn": ["1 Okno PVC 1234567 1200x1400 st", "6"],
+    "antal utanför intervallet": ["1 Okno PVC 1234567 1200x1400 0", "8", "2 Okno PVC 2345678 900x900 500", "2"],
+    "bara ett antal per order": ["1 Okno PVC 1234567 1200x1400 5", "9", "Reorder 3456789", "2", "3"],
+    "för få kolumner": ["Okno 1234567 5", "4", "1 Okno PVC 123456 1200x1400 5"],
+    "order som inte står fjärde": ["1 Okno 1234567 PVC 1200x1400 5", "4"],
+    "blandade mellanslag": ["  1  Okno  PVC  1234567  1200x1400  5  ", " 6 "],
+    "flera poster för samma order": ["1 Okno PVC 1234567 1200x1400 5", "Reorder 1234567", "2"],
+    "långa antal på egen rad": ["Reorder 1234567", "1234", "12"],
+}
+
+INVOICE_CASES = {
+    "vanliga poster": ["Fakturanr: PG-0001-1", "Zamówienie / Order: 1234567", "Okno PVC", "P 5,00 pcs",
+                       "Zamówienie / Order: 2345678", "P 2 pcs"],
+    "flera antal per order": ["Zamówienie / Order: 1234567", "P 1 pcs", "p 2.5 PCS"],
+    "antal före första ordern": ["P 9 pcs", "Zamówienie / Order: 1234567", "P 1 pcs"],
+    "antal utanför intervallet": ["Zamówienie / Order: 1234567", "P 0 pcs", "P 600 pcs", "P 3 pcs"],
+    "ordern och antalet på samma rad": ["Zamówienie / Order: 1234567 P 4 pcs", "P 1 pcs"],
+    "fakturanummer med bindestreck": ["Fakturanummer PG-0000-10", "Zamówienie/Order:7654321", "P 8 pcs"],
+    "utan fakturanummer": ["Zamówienie / Order: 1234567", "P 3 pcs"],
+}
+
+
+def _confirmation(lines):
+    return dict(sum_postings((order, None, qty) for order, qty in iter_confirmation_orders(lines)))
+
+
+@pytest.mark.parametrize("lines", CONFIRMATION_CASES.values(), ids=CONFIRMATION_CASES.keys())
+def test_confirmation_lines_match_reference(lines):
+    assert _confirmation(lines) == dict(confirmation_orders_from_lines(lines))
+
+
+@pytest.mark.parametrize("lines", INVOICE_CASES.values(), ids=INVOICE_CASES.keys())
+def test_invoice_lines_match_reference(lines):
+    orders, invoice_id = _invoice_page_orders(lines)
+    reference_orders, reference_id = invoice_page_orders(lines)
+    assert (dict(orders), invoice_id) == (dict(reference_orders), reference_id)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_synthetic_pages_match_reference(seed):
+    pages, quantities = confirmation_pages(3, seed)
+    lines = [line for page in pages for line in page]
+    assert _confirmation(lines) == dict(confirmation_orders_from_lines(lines)) == quantities
+    for page in invoice_pages(quantities, 3, seed):
+        orders, invoice_id = _invoice_page_orders(page)
+        reference_orders, reference_id = invoice_page_orders(page)
+        assert (dict(orders), invoice_id) == (dict(reference_orders), reference_id)
+
+
+def _write_pdf(pages, path):
+    pdf = FPDF()
+    pdf.set_font("Arial", size=9)
+    for lines in pages:
+        pdf.add_page()
+        for line in lines:
+            pdf.cell(0, 5, line, ln=True)
+    pdf.output(str(path))
+    return str(path)
+
+
+def _write_pdf_out_of_order(rows, path):
+    # Raderna hamnar uppifrån och ned på sidan men ritas i en annan ordning:
+    # först alla rader med jämnt index, sedan de udda.
+    pdf = FPDF()
+    pdf.set_font("Arial", size=9)
+    pdf.add_page()
+    for index in list(range(0, len(rows), 2)) + list(range(1, len(rows), 2)):
+        pdf.set_xy(10, 20 + 6 * index)
+        pdf.cell(0, 5, rows[index])
+    pdf.output(str(path))
+    return str(path)
+
+
+def test_confirmation_pdf_matches_reference(tmp_path):
+    pages, _ = confirmation_pages(2, seed=7)
+    pages.append(CONFIRMATION_CASES["reorder med antal på egen rad"]
+                 + CONFIRMATION_CASES["icke-numerisk sista kolumn"]
+                 + CONFIRMATION_CASES["antal på orderraden"])
+    path = _write_pdf(pages, tmp_path / "bekraftelse.pdf")
+    assert dict(extract_orders_from_confirmation(path)) == dict(reference_confirmation_pdf(path))
+
+
+def test_invoice_pdf_matches_reference(tmp_path):
+    _, quantities = confirmation_pages(2, seed=7)
+    pages = invoice_pages(quantities, 2, seed=7)
+    pages.append(INVOICE_CASES["flera antal per order"])
+    path = _write_pdf(pages, tmp_path / "faktura.pdf")
+    orders, invoice_id = extract_orders_from_invoice(path, workers=1)
+    reference_orders, reference_id = reference_invoice_pdf(path)
+    assert (dict(orders), invoice_id) == (dict(reference_orders), reference_id)
+
+
+def test_pdf_drawn_out_of_reading_order_matches_reference(tmp_path):
+    invoice = _write_pdf_out_of_order(
+        ["Fakturanr: PG-0002-1", "Zamówienie / Order: 1111111", "P 3 pcs", "Zamówienie / Order: 2222222",
+         "P 4 pcs", "Zamówienie / Order: 3333333", "P 7 pcs"], tmp_path / "faktura.pdf")
+    orders, invoice_id = extract_orders_from_invoice(invoice, workers=1)
+    reference_orders, reference_id = reference_invoice_pdf(invoice)
+    assert (dict(orders), invoice_id) == (dict(reference_orders), reference_id)
+    assert dict(orders) == {"1111111": 3, "2222222": 4, "3333333": 7}
+
+    confirmation = _write_pdf_out_of_order(
+        ["Reorder 1111111", "3", "1 Okno PVC 2222222 1200x1400 4", "Reorder 3333333", "7"],
+        tmp_path / "bekraftelse.pdf")
+    assert dict(extract_orders_from_confirmation(confirmation)) == dict(reference_confirmation_pdf(confirmation))